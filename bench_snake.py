@@ -0,0 +1,223 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+# Benchmarks for the simulation and the renderer.
+#
+# Runs offscreen through SDL's dummy video driver unless SDL_VIDEODRIVER is
+# already set. Results are written as JSON; with a baseline file the run is
+# compared against it and exits with status 1 when any benchmark regresses
+# by more than --threshold percent.
+#
+#   python bench_snake.py --save-baseline          # record a baseline
+#   python bench_snake.py --threshold 15           # compare against it
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+from snake_engine import SnakeEngine
+
+BASELINE_FILE = 'bench_baseline.json'
+DEFAULT_THRESHOLD = 10.0  # percent
+
+
+def serpentine_cycle(width, height):
+    # A Hamiltonian cycle of an even-height board: along the top row, back
+    # and forth over columns 1.., then up column 0 to the start
+    cells = [(x, 0) for x in range(width)]
+    for y in range(1, height):
+        xs = range(width-1, 0, -1) if y % 2 else range(1, width)
+        cells.extend((x, y) for x in xs)
+    cells.extend((0, y) for y in range(height-1, 0, -1))
+    return cells
+
+
+def place_snake(engine, cells):
+    # Replaces the engine's snake with `cells` (head first)
+    engine.set_snake(cells)
+    engine.length = len(cells)
+
+
+def timed(fn, iterations, repeats):
+    # Best mean seconds per iteration over `repeats` runs
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(iterations)
+        best = min(best, (time.perf_counter() - start) / iterations)
+    return best
+
+
+def bench_step(width, height, length, repeats):
+    # Steps per second for a snake of `length` circling the board
+    engine = SnakeEngine(0, (width, height))
+    cycle = serpentine_cycle(width, height)
+    place_snake(engine, cycle[length-1::-1])
+    # Keep the apple on another board so the length stays fixed
+    engine.current_board = (engine.apple_board + 1) % engine.board_count
+    position = [length - 1]
+    size = len(cycle)
+
+    def run(iterations):
+        pos = position[0]
+        for _ in range(iterations):
+            x, y = cycle[pos]
+            nx, ny = cycle[(pos + 1) % size]
+            engine.direction = (nx - x, ny - y)
+            engine.update()
+            pos = (pos + 1) % size
+        position[0] = pos
+
+    seconds = timed(run, 20000, repeats)
+    assert not engine.game_over
+    return 1.0 / seconds
+
+
+def bench_apple(width, height, free, repeats):
+    # Seconds per random_apple_pos() call with only `free` cells left
+    engine = SnakeEngine(0, (width, height))
+    cycle = serpentine_cycle(width, height)
+    place_snake(engine, cycle[:len(cycle) - free])
+
+    def run(iterations):
+        for _ in range(iterations):
+            engine.random_apple_pos()
+
+    return timed(run, 20000, repeats)
+
+
+def bench_frames(repeats):
+    import pygame
+    from snake_game import SnakeGame
+    results = {}
+    game = SnakeGame(0)
+    cycle = serpentine_cycle(20, 20)
+    place_snake(game.engine, cycle[199::-1])
+    game.engine.current_board = (game.engine.apple_board + 1) % game.engine.board_count
+
+    def frames(iterations):
+        for _ in range(iterations):
+            game.draw_board()
+
+    results['frame_board_s'] = timed(frames, 200, repeats)
+    game.in_color_menu = True
+    results['frame_color_menu_s'] = timed(frames, 200, repeats)
+    game.in_color_grid = True
+    results['frame_color_grid_s'] = timed(frames, 200, repeats)
+    game.in_color_menu = game.in_color_grid = False
+    game.dirty_rendering = True
+    position = [199]
+
+    def dirty_frames(iterations):
+        engine = game.engine
+        pos = position[0]
+        for _ in range(iterations):
+            x, y = cycle[pos]
+            nx, ny = cycle[(pos + 1) % len(cycle)]
+            engine.direction = (nx - x, ny - y)
+            engine.update()
+            pos = (pos + 1) % len(cycle)
+            game.draw_dirty()
+        position[0] = pos
+
+    game.draw_dirty()
+    results['frame_dirty_step_s'] = timed(dirty_frames, 200, repeats)
+    pygame.quit()
+    return results
+
+
+def bench_startup(repeats):
+    # Best SnakeGame() construction time and time to the first frame
+    import pygame
+    from snake_game import SnakeGame
+    best = best_frame = float('inf')
+    for _ in range(repeats):
+        pygame.quit()
+        start = time.perf_counter()
+        game = SnakeGame()
+        best = min(best, time.perf_counter() - start)
+        game.present()
+        best_frame = min(best_frame, game.first_frame_time)
+    pygame.quit()
+    return best, best_frame
+
+
+def run_benchmarks(repeats, render=True):
+    # Returns {name: {'value': ..., 'unit': ..., 'higher_is_better': ...}}
+    results = {}
+
+    def add(name, value, unit, higher_is_better):
+        results[name] = {'value': value, 'unit': unit, 'higher_is_better': higher_is_better}
+
+    for width, height in ((20, 20), (60, 60), (200, 200)):
+        for length in (3, (width * height) // 2, width * height - 1):
+            add(f'step_{width}x{height}_len{length}', bench_step(width, height, length, repeats),
+                'steps/s', True)
+    for free in (200, 10, 1):
+        add(f'apple_20x20_free{free}', bench_apple(20, 20, free, repeats), 's', False)
+    if render:
+        for name, value in bench_frames(repeats).items():
+            add(name, value, 's', False)
+        startup, first_frame = bench_startup(repeats)
+        add('startup_s', startup, 's', False)
+        add('first_frame_s', first_frame, 's', False)
+    return results
+
+
+def compare(results, baseline, threshold):
+    # Returns a list of (name, change_percent) for regressions past threshold
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None or not base['value']:
+            continue
+        change = (result['value'] - base['value']) / base['value'] * 100.0
+        worse = -change if result['higher_is_better'] else change
+        result['change_percent'] = round(change, 2)
+        if worse > threshold:
+            regressions.append((name, worse))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark Multi-Board Snake')
+    parser.add_argument('--output', default='-', help="JSON results file ('-' for stdout)")
+    parser.add_argument('--baseline', default=BASELINE_FILE, help='baseline JSON to compare against')
+    parser.add_argument('--save-baseline', action='store_true', help='write the results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='allowed regression in percent before failing')
+    parser.add_argument('--repeats', type=int, default=5, help='runs per benchmark; the best is kept')
+    parser.add_argument('--no-render', action='store_true', help='skip the pygame benchmarks')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.repeats, render=not args.no_render)
+    regressions = []
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+    report = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'threshold_percent': args.threshold,
+        'results': results,
+        'regressions': [{'name': name, 'worse_percent': round(worse, 2)} for name, worse in regressions],
+    }
+    text = json.dumps(report, indent=2)
+    if args.output == '-':
+        print(text)
+    else:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            f.write(text + '\n')
+    for name, worse in regressions:
+        print(f'REGRESSION {name}: {worse:.1f}% worse than baseline', file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,281 @@
+import heapq
+import math
+import time
+from collections import deque
+
+from snake_engine import DIRECTIONS, SnakeEngine, simulate
+
+# Autopilot: plays the game with no human input.
+#
+# The autopilot plans a path to the apple with A* over the engine's occupancy
+# grid. The search is time-aware: the grid stores each segment's serial, so
+# it knows how many ticks remain before the tail frees a cell, and a path may
+# run through cells that will be empty by the time the head gets there. A
+# path is only taken if the tail is still reachable from where it ends, so
+# the snake never walls itself in; otherwise the autopilot chases its tail
+# the long way round until a safe path opens up.
+#
+# A plan is followed tick by tick without replanning. If the snake leaves it
+# (a key press, a fallback move), the plan is repaired by a BFS back onto its
+# remaining cells before a full replan is tried. All planning on one tick
+# stays within a fixed time budget. When the budget runs out the autopilot
+# keeps to what it already knows is safe: the current plan, or else the
+# route to the tail found when the plan (or the last tail chase) was checked.
+# Only when neither fits does it fall back to a cheap flood-fill move.
+#
+# Board switches are free and do not affect movement, so the autopilot
+# switches straight to the apple's board.
+
+AUTOPILOT_BUDGET = 0.002  # seconds of planning per tick; None for no limit
+FALLBACK_FILL_LIMIT = 64  # cells flood-filled to rank moves without a plan
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+class Autopilot:
+    def __init__(self, engine, budget=AUTOPILOT_BUDGET):
+        self.engine = engine
+        self.budget = budget
+        self.deadline = 0.0
+        self.plan = deque()  # cells the head will enter, the apple last
+        self.tail_route = deque()  # tail-safe cells to enter once the plan is done
+        # Counters for soak tests
+        self.replans = 0
+        self.repairs = 0
+        self.timeouts = 0
+        self.worst_tick = 0.0
+
+    def step(self, target=None):
+        # Sends this tick's inputs to `target` (the engine by default; the
+        # game passes itself so board switches animate and get recorded)
+        engine = self.engine
+        target = target if target is not None else engine
+        if engine.game_over:
+            self.plan.clear()
+            self.tail_route.clear()
+            return
+        start = time.perf_counter()
+        self.deadline = start + self.budget if self.budget is not None else math.inf
+        delta = 1 if engine.apple_board > engine.current_board else -1
+        while engine.current_board != engine.apple_board:
+            if not target.switch_board(delta):
+                break
+        try:
+            cell = self.next_cell()
+        except BudgetExceeded:
+            self.timeouts += 1
+            cell = self.safe_move()
+        if cell is not None:
+            x, y = engine.snake[0]
+            direction = (cell[0] - x, cell[1] - y)
+            if direction != engine.direction:
+                target.queue_direction(direction)
+        self.worst_tick = max(self.worst_tick, time.perf_counter() - start)
+
+    __call__ = step
+
+    def tick_budget(self):
+        # Called from search loops; raises once this tick's budget is spent
+        if time.perf_counter() > self.deadline:
+            raise BudgetExceeded()
+
+    def next_cell(self):
+        # The cell to move into this tick, following, repairing or replacing
+        # the plan as needed; None when every move is fatal
+        engine = self.engine
+        plan = self.plan
+        if plan and plan[-1] != engine.apple_pos:
+            plan.clear()
+        if plan and not self.follows(plan[0]):
+            self.repairs += 1
+            if not self.repair():
+                plan.clear()
+        if not plan:
+            self.replans += 1
+            path = self.search({engine.apple_pos}, engine.apple_pos)
+            if path is not None:
+                route = self.escape(path)
+                if route is not None:
+                    plan.extend(path)
+                    self.tail_route = deque(route)
+        if plan:
+            return plan.popleft()
+        return self.chase_tail()
+
+    def safe_move(self):
+        # Out of budget: the next cell of the plan, else of the tail route,
+        # when it can still be entered; the flood fill only as a last resort
+        plan = self.plan
+        if plan and plan[-1] == self.engine.apple_pos and self.follows(plan[0]):
+            return plan.popleft()
+        plan.clear()
+        route = self.tail_route
+        if route and self.follows(route[0]):
+            return route.popleft()
+        route.clear()
+        return self.roomiest_move()
+
+    def follows(self, cell):
+        # True when `cell` is a legal first move from the current head
+        engine = self.engine
+        x, y = engine.snake[0]
+        direction = (cell[0] - x, cell[1] - y)
+        if direction not in DIRECTIONS or direction == (-engine.direction[0], -engine.direction[1]):
+            return False
+        return self.free_at(cell, 1)
+
+    def in_bounds(self, cell):
+        width, height = self.engine.board_size
+        return 0 <= cell[0] < width and 0 <= cell[1] < height
+
+    def free_at(self, cell, t):
+        # True when the head can enter `cell` on the t-th tick from now:
+        # in bounds, and either free or vacated by the tail before then
+        engine = self.engine
+        if not self.in_bounds(cell):
+            return False
+        serial = engine.occupancy.get(cell)
+        if serial is None:
+            return True
+        # Segments from this one to the tail, plus ticks of growth still due
+        n = len(engine.snake)
+        behind = n - (engine.head_serial - serial)
+        return t > behind + max(0, engine.length - n)
+
+    def search(self, goals, aim=None, head=None, free_at=None):
+        # Shortest time-aware path from the head to any cell in `goals`.
+        # A* towards `aim`, plain BFS order without one. Returns the cells to
+        # enter, or None. `head` and `free_at` describe a hypothetical snake;
+        # by default it is the engine's, which may not reverse.
+        engine = self.engine
+        reverse = None
+        if head is None:
+            head = engine.snake[0]
+            free_at = self.free_at
+            reverse = (-engine.direction[0], -engine.direction[1])
+        came = {head: None}
+        counter = 0
+        frontier = [(0, 0, counter, head)]
+        while frontier:
+            # Ties go to the deepest cell, so A* runs straight at its aim
+            _, t, _, cell = heapq.heappop(frontier)
+            t = -t
+            if cell in goals and cell != head:
+                path = []
+                while cell != head:
+                    path.append(cell)
+                    cell = came[cell]
+                path.reverse()
+                return path
+            self.tick_budget()
+            x, y = cell
+            for dx, dy in DIRECTIONS:
+                if t == 0 and (dx, dy) == reverse:
+                    continue
+                nxt = (x + dx, y + dy)
+                if nxt in came or not free_at(nxt, t + 1):
+                    continue
+                came[nxt] = cell
+                counter += 1
+                h = abs(nxt[0] - aim[0]) + abs(nxt[1] - aim[1]) if aim is not None else 0
+                heapq.heappush(frontier, (t + 1 + h, -t - 1, counter, nxt))
+        return None
+
+    def repair(self):
+        # Reconnects the head to the remaining plan; False if that fails
+        plan = self.plan
+        index = {cell: i for i, cell in enumerate(plan)}
+        prefix = self.search(index)
+        if prefix is None:
+            return False
+        rest = list(plan)[index[prefix[-1]] + 1:]
+        path = prefix + rest
+        if len(set(path)) != len(path):
+            return False
+        if not all(self.free_at(cell, t) for t, cell in enumerate(path, 1)):
+            return False
+        route = self.escape(path)
+        if route is None:
+            return False
+        plan.clear()
+        plan.extend(path)
+        self.tail_route = deque(route)
+        return True
+
+    def escape(self, path, eats=True):
+        # The shortest way (a list of cells) from the end of `path` to the
+        # tail, once the snake has followed it (and eaten at its end), or
+        # None when the head would be walled in. Entering the tail's cell
+        # means the snake can keep following its tail, so it is safe.
+        engine = self.engine
+        length = engine.length + 1 if eats else engine.length
+        body = path[::-1] + list(engine.snake)
+        body = body[:min(len(engine.snake) + len(path), length)]
+        grow = length - len(body)
+        index = {cell: i for i, cell in enumerate(body)}
+        in_bounds = self.in_bounds
+
+        def free_at(cell, t):
+            i = index.get(cell)
+            return in_bounds(cell) and (i is None or t > len(body) - i + grow)
+
+        return self.search({body[-1]}, body[-1], body[0], free_at)
+
+    def moves(self):
+        # Cells the head can enter this tick
+        engine = self.engine
+        x, y = engine.snake[0]
+        return [cell for cell in ((x + dx, y + dy) for dx, dy in DIRECTIONS) if self.follows(cell)]
+
+    def chase_tail(self):
+        # Without a safe path to the apple, take the move from which the
+        # tail is furthest away but still reachable, to buy time. Its route
+        # to the tail is kept in case the next ticks run out of budget.
+        best, best_route = None, None
+        for cell in self.moves():
+            route = self.escape([cell], eats=False)
+            if route is not None and (best_route is None or len(route) > len(best_route)):
+                best, best_route = cell, route
+        if best is None:
+            return self.roomiest_move()
+        self.tail_route = deque(best_route)
+        return best
+
+    def roomiest_move(self):
+        # Cheap fallback: the move with the most free space around it,
+        # counting at most FALLBACK_FILL_LIMIT cells
+        engine = self.engine
+        occupancy = engine.occupancy
+        in_bounds = self.in_bounds
+        best, best_room = None, -1
+        for cell in self.moves():
+            seen = {cell}
+            queue = deque([cell])
+            while queue and len(seen) < FALLBACK_FILL_LIMIT:
+                x, y = queue.popleft()
+                for dx, dy in DIRECTIONS:
+                    nxt = (x + dx, y + dy)
+                    if nxt not in seen and nxt not in occupancy and in_bounds(nxt):
+                        seen.add(nxt)
+                        queue.append(nxt)
+            if len(seen) > best_room:
+                best, best_room = cell, len(seen)
+        return best
+
+
+def soak(games=10, seed=0, max_ticks=100000, **engine_kwargs):
+    # Plays `games` headless games; yields (score, ticks, won, autopilot)
+    for game in range(games):
+        engine = SnakeEngine(seed + game, **engine_kwargs)
+        autopilot = Autopilot(engine)
+        ticks = simulate(engine, max_ticks, autopilot)
+        yield engine.score, ticks, engine.won, autopilot
+
+
+if __name__ == '__main__':
+    for score, ticks, won, autopilot in soak():
+        print(f'score {score:4d}  ticks {ticks:6d}  won {won!s:5}  replans {autopilot.replans}  '
+              f'repairs {autopilot.repairs}  timeouts {autopilot.timeouts}  '
+              f'worst tick {autopilot.worst_tick * 1000:.2f} ms')
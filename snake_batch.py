@@ -0,0 +1,189 @@
+import numpy as np
+
+from snake_engine import BOARD_COUNT, BOARD_SIZE, DIRECTIONS, START_LENGTH
+
+# Vectorized batch engine: many independent games advanced in lockstep.
+#
+# BatchSnakeEngine keeps N games as NumPy arrays and steps all of them with
+# a fixed number of array operations, so the per-game cost is a few
+# nanoseconds rather than a Python method call. The rules are the ones in
+# SnakeEngine.update(): wall and self collisions are checked before the tail
+# moves, apples only count on their own board, a full board is a win, and
+# board switches apply before the move. Finished games are reset
+# automatically. Needs NumPy (the rest of the game does not).
+#
+# Cells are stored as flat indices (y * width + x). Each game's body is a
+# ring buffer of cells, with an occupancy bitmap for O(1) self-collision.
+
+ACTION_NONE = 0
+ACTION_UP, ACTION_DOWN, ACTION_LEFT, ACTION_RIGHT = 1, 2, 3, 4
+ACTION_BOARD_UP = 5  # W: previous board
+ACTION_BOARD_DOWN = 6  # S: next board
+ACTION_COUNT = 7
+
+# Direction codes index DIRECTIONS: UP, DOWN, LEFT, RIGHT
+DIR_DX = np.array([d[0] for d in DIRECTIONS], dtype=np.int32)
+DIR_DY = np.array([d[1] for d in DIRECTIONS], dtype=np.int32)
+OPPOSITE = np.array([DIRECTIONS.index((-d[0], -d[1])) for d in DIRECTIONS], dtype=np.int8)
+APPLE_TRIES = 8  # rejection-sampling rounds before scanning for free cells
+
+
+class BatchSnakeEngine:
+    def __init__(self, num_games, seed=None, board_size=BOARD_SIZE, board_count=BOARD_COUNT,
+                 auto_reset=True):
+        self.num_games = num_games
+        self.board_size = board_size
+        self.board_count = board_count
+        self.auto_reset = auto_reset
+        self.rng = np.random.default_rng(seed)
+        width, height = board_size
+        self.cells = width * height
+        n = num_games
+        self.games = np.arange(n)
+        self.body = np.zeros((n, self.cells), dtype=np.int32)
+        self.occupancy = np.zeros((n, self.cells), dtype=np.bool_)
+        self.head_ptr = np.zeros(n, dtype=np.int32)
+        self.body_len = np.zeros(n, dtype=np.int32)
+        self.length = np.zeros(n, dtype=np.int32)
+        self.head_x = np.zeros(n, dtype=np.int32)
+        self.head_y = np.zeros(n, dtype=np.int32)
+        self.direction = np.zeros(n, dtype=np.int8)
+        self.score = np.zeros(n, dtype=np.int32)
+        self.current_board = np.zeros(n, dtype=np.int32)
+        self.apple_board = np.zeros(n, dtype=np.int32)
+        self.apple_cell = np.zeros(n, dtype=np.int32)
+        self.done = np.zeros(n, dtype=np.bool_)
+        self.won = np.zeros(n, dtype=np.bool_)
+        self.steps = np.zeros(n, dtype=np.int64)
+        self.reset()
+
+    def reset(self, mask=None):
+        # Starts new games for the selected games (all by default)
+        games = self.games if mask is None else np.flatnonzero(mask)
+        if games.size == 0:
+            return
+        width, height = self.board_size
+        start_x, start_y = width // 2, height // 2
+        start = start_y * width + start_x
+        self.occupancy[games] = False
+        self.occupancy[games, start] = True
+        self.body[games, 0] = start
+        self.head_ptr[games] = 0
+        self.body_len[games] = 1
+        self.length[games] = START_LENGTH
+        self.head_x[games] = start_x
+        self.head_y[games] = start_y
+        self.direction[games] = 0  # UP
+        self.score[games] = 0
+        self.current_board[games] = min(1, self.board_count - 1)
+        self.done[games] = False
+        self.won[games] = False
+        self.steps[games] = 0
+        self.apple_board[games] = self.rng.integers(0, self.board_count, games.size)
+        self.apple_cell[games] = self.sample_free(games)
+
+    def sample_free(self, games):
+        # A random free cell for each game in `games` (-1 when full)
+        cells = self.rng.integers(0, self.cells, games.size).astype(np.int32)
+        pending = np.flatnonzero(self.occupancy[games, cells])
+        for _ in range(APPLE_TRIES):
+            if pending.size == 0:
+                return cells
+            retry = self.rng.integers(0, self.cells, pending.size).astype(np.int32)
+            cells[pending] = retry
+            pending = pending[self.occupancy[games[pending], retry]]
+        # Nearly full boards: pick among the remaining free cells directly
+        for i in pending:
+            free = np.flatnonzero(~self.occupancy[games[i]])
+            cells[i] = self.rng.choice(free) if free.size else -1
+        return cells
+
+    def apply_actions(self, actions):
+        # Turns (with the reverse check) and board switches, as the keyboard
+        # handler applies them before the next tick
+        actions = np.asarray(actions)
+        turn = (actions >= ACTION_UP) & (actions <= ACTION_RIGHT)
+        wanted = (actions - ACTION_UP).astype(np.int8)
+        turn &= OPPOSITE[np.where(turn, wanted, 0)] != self.direction
+        self.direction[turn] = wanted[turn]
+        shift = (actions == ACTION_BOARD_DOWN).astype(np.int32) - (actions == ACTION_BOARD_UP)
+        self.current_board = np.clip(self.current_board + shift, 0, self.board_count - 1).astype(np.int32)
+
+    def step(self, actions=None):
+        # Advances every game one tick. Returns (ate, finished): boolean
+        # arrays of games that ate an apple and games that ended this tick.
+        # With auto_reset, finished games restart before returning; their
+        # final score is in self.final_score.
+        if actions is not None:
+            self.apply_actions(actions)
+        width, height = self.board_size
+        running = ~self.done
+        x = self.head_x + DIR_DX[self.direction]
+        y = self.head_y + DIR_DY[self.direction]
+        wall = (x < 0) | (x >= width) | (y < 0) | (y >= height)
+        cell = np.where(wall, 0, y * width + x).astype(np.int32)
+        hit = wall | self.occupancy[self.games, cell]
+        dead = running & hit
+        moving = np.flatnonzero(running & ~hit)
+        # Move the head
+        cell_m = cell[moving]
+        ptr = (self.head_ptr[moving] + 1) % self.cells
+        self.head_ptr[moving] = ptr
+        self.body[moving, ptr] = cell_m
+        self.occupancy[moving, cell_m] = True
+        self.body_len[moving] += 1
+        self.head_x[moving] = x[moving]
+        self.head_y[moving] = y[moving]
+        self.steps[moving] += 1
+        # Apples
+        ate = np.zeros(self.num_games, dtype=np.bool_)
+        ate[moving] = (self.current_board[moving] == self.apple_board[moving]) & (cell_m == self.apple_cell[moving])
+        eaters = np.flatnonzero(ate)
+        won = np.zeros(self.num_games, dtype=np.bool_)
+        if eaters.size:
+            self.length[eaters] += 1
+            self.score[eaters] += 1
+            self.apple_board[eaters] = self.rng.integers(0, self.board_count, eaters.size)
+            apples = self.sample_free(eaters)
+            self.apple_cell[eaters] = apples
+            won[eaters[apples < 0]] = True
+        # Move the tail (not for a game that just won, as in SnakeEngine)
+        popping = moving[(self.body_len[moving] > self.length[moving]) & ~won[moving]]
+        tail_ptr = (self.head_ptr[popping] - self.body_len[popping] + 1) % self.cells
+        self.occupancy[popping, self.body[popping, tail_ptr]] = False
+        self.body_len[popping] -= 1
+        finished = dead | won
+        self.done |= finished
+        self.won |= won
+        self.final_score = np.where(finished, self.score, 0)
+        if self.auto_reset:
+            self.reset(finished)
+        return ate, finished
+
+    def snake(self, game):
+        # Body cells of one game as (x, y) tuples, head first
+        width = self.board_size[0]
+        ptrs = (self.head_ptr[game] - np.arange(self.body_len[game])) % self.cells
+        return [(int(c) % width, int(c) // width) for c in self.body[game, ptrs]]
+
+    def apple_pos(self, game):
+        cell = int(self.apple_cell[game])
+        if cell < 0:
+            return None
+        return (cell % self.board_size[0], cell // self.board_size[0])
+
+
+def measure_steps_per_second(num_games=8192, steps=500, seed=0):
+    # Game-steps per second with random actions, auto-resetting
+    import time
+    engine = BatchSnakeEngine(num_games, seed)
+    rng = np.random.default_rng(seed)
+    actions = rng.integers(0, ACTION_COUNT, (steps, num_games)).astype(np.int8)
+    start = time.perf_counter()
+    for t in range(steps):
+        engine.step(actions[t])
+    return num_games * steps / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    print(f'{measure_steps_per_second():,.0f} game-steps/sec (batch)')
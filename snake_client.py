@@ -0,0 +1,132 @@
+import argparse
+import asyncio
+
+import pygame
+
+from snake_game import (APPLE_COLOR, BOARD_COLORS, CELL_SIZE, GLOWING_COLOR, INFO_BAR_HEIGHT, RENDER_FPS,
+                        SNAKE_BASE_COLORS, TRANSPARENT_COLOR, ensure_board_colors)
+from snake_palette import GradientCache
+from snake_render import SurfaceCache, TextCache, load_font
+from snake_replay import EV_BOARD_DOWN, EV_BOARD_UP, EV_DOWN, EV_LEFT, EV_RESTART, EV_RIGHT, EV_UP
+from snake_server import MSG_INPUT, MSG_JOIN, ClientState, frame, read_frame
+
+# pygame client for snake_server.py.
+#
+#   python snake_client.py HOST [--port 7777] [--room NAME]
+#
+# The client only renders: key presses go straight to the server, and the
+# screen shows the ClientState rebuilt from the server's deltas. Your snake
+# is drawn in your board's colours, everyone else's in grey.
+
+MAX_PLAY_AREA = 800  # pixels; cells shrink to fit larger boards
+OTHER_SNAKE_COLOR = (110, 110, 110)
+KEY_EVENTS = {
+    pygame.K_UP: EV_UP, pygame.K_DOWN: EV_DOWN, pygame.K_LEFT: EV_LEFT, pygame.K_RIGHT: EV_RIGHT,
+    pygame.K_w: EV_BOARD_UP, pygame.K_s: EV_BOARD_DOWN, pygame.K_r: EV_RESTART,
+}
+
+
+class SnakeClient:
+    def __init__(self, state):
+        self.state = state
+        width, height = state.board_size
+        self.cell = min(CELL_SIZE, MAX_PLAY_AREA // max(width, height))
+        self.play_area = (width * self.cell, height * self.cell)
+        ensure_board_colors(state.board_count)
+        self.screen = pygame.display.set_mode((max(self.play_area[0], 500), self.play_area[1] + INFO_BAR_HEIGHT))
+        pygame.display.set_caption('Multi-Board Snake (online)')
+        self.text = TextCache(load_font('Arial', 24))
+        self.surfaces = SurfaceCache()
+        self.palette = GradientCache()
+
+    def cell_rect(self, cell):
+        return pygame.Rect(cell[0] * self.cell, INFO_BAR_HEIGHT + cell[1] * self.cell, self.cell, self.cell)
+
+    def draw(self):
+        state = self.state
+        you = state.you
+        board = state.boards.get(you, 0)
+        self.screen.fill((30, 30, 30))
+        pygame.draw.rect(self.screen, BOARD_COLORS[board], (0, INFO_BAR_HEIGHT, *self.play_area))
+        for pid, snake in state.snakes.items():
+            if pid == you or not snake:
+                continue
+            for segment in snake:
+                pygame.draw.rect(self.screen, OTHER_SNAKE_COLOR, self.cell_rect(segment))
+        snake = state.snakes.get(you)
+        if snake:
+            colors = self.palette.get(SNAKE_BASE_COLORS[board], len(snake))
+            for idx, segment in enumerate(snake):
+                pygame.draw.rect(self.screen, colors[idx], self.cell_rect(segment))
+        if state.apple_pos is not None:
+            self.draw_apple(board)
+        score = self.text.slot('score', f'Score: {state.scores.get(you, 0)}', (255,255,255))
+        self.screen.blit(score, (10, 10))
+        board_text = self.text.slot('board', f'Board: {board+1}', (255,255,255))
+        self.screen.blit(board_text, (180, 10))
+        players = self.text.slot('players', f'Players: {len(state.snakes)}', (200,200,200))
+        self.screen.blit(players, (330, 10))
+        if not snake:
+            over = self.text.render('You died! Press R to respawn.', (255,0,0))
+            self.screen.blit(over, (10, 70))
+        pygame.display.flip()
+
+    def draw_apple(self, board):
+        # Same colours as the single player game
+        state = self.state
+        rect = self.cell_rect(state.apple_pos)
+        if state.apple_board == board:
+            pygame.draw.ellipse(self.screen, APPLE_COLOR, rect)
+        elif state.apple_board < board:
+            pygame.draw.ellipse(self.screen, GLOWING_COLOR, rect)
+        else:
+            def build():
+                surface = pygame.Surface(rect.size, pygame.SRCALPHA)
+                surface.fill(TRANSPARENT_COLOR)
+                return surface
+            self.screen.blit(self.surfaces.get('ghost_apple', rect.size, build), rect)
+
+
+async def play(host, port, room, fps=RENDER_FPS):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(frame(bytes([MSG_JOIN]) + room.encode()))
+    state = ClientState()
+
+    async def receive():
+        while True:
+            payload = await read_frame(reader)
+            if payload is None:
+                return
+            state.apply(payload)
+
+    receiver = asyncio.create_task(receive())
+    pygame.display.init()
+    pygame.font.init()
+    client = None
+    running = True
+    try:
+        while running and not receiver.done():
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    running = False
+                elif event.type == pygame.KEYDOWN and event.key in KEY_EVENTS:
+                    writer.write(frame(bytes([MSG_INPUT, KEY_EVENTS[event.key]])))
+            if state.you is not None:
+                if client is None:
+                    client = SnakeClient(state)
+                client.draw()
+            await asyncio.sleep(1.0 / fps)
+    finally:
+        receiver.cancel()
+        writer.close()
+        pygame.quit()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Multi-Board Snake online client')
+    parser.add_argument('host')
+    parser.add_argument('--port', type=int, default=7777)
+    parser.add_argument('--room', default='lobby')
+    parser.add_argument('--fps', type=int, default=RENDER_FPS)
+    args = parser.parse_args()
+    asyncio.run(play(args.host, args.port, args.room, args.fps))
@@ -0,0 +1,270 @@
+import numpy as np
+
+from snake_batch import ACTION_BOARD_DOWN, ACTION_BOARD_UP, ACTION_COUNT, ACTION_RIGHT, ACTION_UP, BatchSnakeEngine
+from snake_engine import BOARD_COUNT, BOARD_SIZE, DIRECTIONS, SnakeEngine
+
+# Gym-style environments for training agents.
+#
+# SnakeEnv wraps one SnakeEngine with reset()/step(action); VecSnakeEnv steps
+# many games together on a BatchSnakeEngine. Both use the batch engine's
+# ACTION_* codes (no-op, four turns, W/S board switches) and return the same
+# observation: a uint8 array of shape (boards, height, width, OBS_CHANNELS)
+# that is allocated once and updated in place, touching only the cells that
+# changed on each step. Callers that keep an observation across steps must
+# copy it.
+#
+# step() returns (observation, reward, terminated, truncated, info) as in
+# Gymnasium, without depending on it.
+
+OBS_BODY = 0  # snake segments, on the current board
+OBS_HEAD = 1  # the head, on the current board
+OBS_APPLE = 2  # the apple, on its board
+OBS_BOARD = 3  # the whole plane of the current board
+OBS_CHANNELS = 4
+OBS_ON = 255
+
+REWARD_APPLE = 1.0
+REWARD_DEATH = -1.0
+
+
+def observation_shape(board_size, board_count):
+    width, height = board_size
+    return (board_count, height, width, OBS_CHANNELS)
+
+
+class SnakeEnv:
+    # render_mode is None, 'rgb_array' (offscreen frames) or 'human' (a window)
+    render_modes = (None, 'rgb_array', 'human')
+    action_count = ACTION_COUNT
+
+    def __init__(self, seed=None, board_size=BOARD_SIZE, board_count=BOARD_COUNT,
+                 render_mode=None, max_steps=None):
+        if render_mode not in self.render_modes:
+            raise ValueError(f'unknown render mode {render_mode!r}')
+        self.engine = SnakeEngine(seed, board_size, board_count)
+        self.render_mode = render_mode
+        self.max_steps = max_steps
+        self.steps = 0
+        self.game = None
+        self.observation_shape = observation_shape(board_size, board_count)
+        self.obs = np.zeros(self.observation_shape, dtype=np.uint8)
+        self.write_observation()
+
+    def reset(self, seed=None):
+        # Starts a new game; returns (observation, info)
+        if seed is not None:
+            self.engine.seed(seed)
+        self.engine.reset()
+        self.steps = 0
+        self.write_observation()
+        return self.obs, self.info()
+
+    def step(self, action):
+        engine = self.engine
+        board = engine.current_board
+        if ACTION_UP <= action <= ACTION_RIGHT:
+            engine.set_direction(DIRECTIONS[action - ACTION_UP])
+        elif action == ACTION_BOARD_UP:
+            engine.switch_board(-1)
+        elif action == ACTION_BOARD_DOWN:
+            engine.switch_board(1)
+        if engine.current_board != board:
+            self.move_board(board, engine.current_board)
+        score = engine.score
+        head = engine.snake[0]
+        tail = engine.snake[-1]
+        apple = (engine.apple_board, engine.apple_pos)
+        engine.update()
+        self.steps += 1
+        plane = self.obs[engine.current_board]
+        if engine.snake[0] != head:
+            plane[head[1], head[0], OBS_HEAD] = 0
+            x, y = engine.snake[0]
+            plane[y, x, OBS_BODY] = plane[y, x, OBS_HEAD] = OBS_ON
+            if engine.snake[-1] != tail:
+                plane[tail[1], tail[0], OBS_BODY] = 0
+        if (engine.apple_board, engine.apple_pos) != apple:
+            self.set_apple(*apple, 0)
+            self.set_apple(engine.apple_board, engine.apple_pos, OBS_ON)
+        reward = (engine.score - score) * REWARD_APPLE
+        if engine.game_over and not engine.won:
+            reward += REWARD_DEATH
+        truncated = self.max_steps is not None and self.steps >= self.max_steps
+        if self.render_mode == 'human':
+            self.render()
+        return self.obs, reward, engine.game_over, truncated, self.info()
+
+    def info(self):
+        engine = self.engine
+        return {'score': engine.score, 'length': len(engine.snake), 'won': engine.won,
+                'current_board': engine.current_board, 'apple_board': engine.apple_board}
+
+    def write_observation(self):
+        # Full rebuild, on reset only; step() patches the changed cells
+        engine = self.engine
+        obs = self.obs
+        obs.fill(0)
+        plane = obs[engine.current_board]
+        plane[:, :, OBS_BOARD] = OBS_ON
+        for x, y in engine.snake:
+            plane[y, x, OBS_BODY] = OBS_ON
+        x, y = engine.snake[0]
+        plane[y, x, OBS_HEAD] = OBS_ON
+        self.set_apple(engine.apple_board, engine.apple_pos, OBS_ON)
+
+    def move_board(self, old, new):
+        # The snake goes with the current board
+        obs = self.obs
+        obs[new, :, :, OBS_BODY:OBS_HEAD+1] = obs[old, :, :, OBS_BODY:OBS_HEAD+1]
+        obs[old, :, :, OBS_BODY:OBS_HEAD+1] = 0
+        obs[old, :, :, OBS_BOARD] = 0
+        obs[new, :, :, OBS_BOARD] = OBS_ON
+
+    def set_apple(self, board, pos, value):
+        if pos is not None:
+            self.obs[board, pos[1], pos[0], OBS_APPLE] = value
+
+    def render(self):
+        # Draws the game with SnakeGame's renderer. In 'rgb_array' mode this
+        # returns a pygame.surfarray.pixels3d view of the env's own
+        # off-screen surface, indexed [x, y, rgb]: no pixels are copied, but
+        # the view locks the surface, so it must be released before the next
+        # render().
+        if self.render_mode is None:
+            return None
+        import pygame
+        if self.game is None:
+            from snake_game import SnakeGame, screen_layout
+            engine = self.engine
+            screen = None
+            if self.render_mode == 'rgb_array':
+                screen = pygame.Surface(screen_layout(engine.board_size)[2])
+            self.game = SnakeGame(board_size=engine.board_size, board_count=engine.board_count, screen=screen)
+            self.game.engine = self.game.controls = engine
+        game = self.game
+        if self.render_mode == 'human':
+            # Nothing else reads the window's events; without this the window
+            # is reported as not responding
+            pygame.event.pump()
+            game.present()
+            return None
+        game.render()
+        return pygame.surfarray.pixels3d(game.screen)
+
+    def close(self):
+        # Other envs may still be rendering, so pygame itself stays up; a
+        # 'human' env only closes its window
+        if self.game is not None:
+            if self.game.windowed:
+                import pygame
+                pygame.display.quit()
+            self.game = None
+
+
+class VecSnakeEnv:
+    # num_envs games stepped together. Observations have shape
+    # (num_envs, boards, height, width, OBS_CHANNELS); rewards, terminated
+    # and truncated are arrays with one entry per game. Games that end are
+    # restarted within the same step, as Gymnasium's vector environments
+    # do, and info['final_score'] holds the score they ended with.
+    action_count = ACTION_COUNT
+
+    def __init__(self, num_envs, seed=None, board_size=BOARD_SIZE, board_count=BOARD_COUNT,
+                 max_steps=None):
+        self.num_envs = num_envs
+        self.engine = BatchSnakeEngine(num_envs, seed, board_size, board_count)
+        self.max_steps = max_steps
+        self.observation_shape = observation_shape(board_size, board_count)
+        self.obs = np.zeros((num_envs,) + self.observation_shape, dtype=np.uint8)
+        # The same memory with each board's cells flattened, so engine cell
+        # indices address it directly
+        self.flat = self.obs.reshape(num_envs, board_count, -1, OBS_CHANNELS)
+        self.write_games(self.engine.games)
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self.engine.rng = np.random.default_rng(seed)
+        self.engine.reset()
+        self.write_games(self.engine.games)
+        return self.obs, self.info(np.zeros(self.num_envs, dtype=np.int32))
+
+    def step(self, actions):
+        engine = self.engine
+        obs = self.obs
+        flat = self.flat
+        width = engine.board_size[0]
+        old_board = engine.current_board.copy()
+        engine.apply_actions(actions)
+        switched = np.flatnonzero(engine.current_board != old_board)
+        if switched.size:
+            old, new = old_board[switched], engine.current_board[switched]
+            obs[switched, new, :, :, OBS_BODY:OBS_HEAD+1] = obs[switched, old, :, :, OBS_BODY:OBS_HEAD+1]
+            obs[switched, old, :, :, OBS_BODY:OBS_HEAD+1] = 0
+            obs[switched, old, :, :, OBS_BOARD] = 0
+            obs[switched, new, :, :, OBS_BOARD] = OBS_ON
+        head = engine.head_y * width + engine.head_x
+        tail = engine.body[engine.games, (engine.head_ptr - engine.body_len + 1) % engine.cells]
+        body_len = engine.body_len.copy()
+        apple_board = engine.apple_board.copy()
+        apple_cell = engine.apple_cell.copy()
+        ate, terminated = engine.step()
+        final_score = engine.final_score
+        truncated = np.zeros(self.num_envs, dtype=np.bool_)
+        if self.max_steps is not None:
+            truncated = ~terminated & (engine.steps >= self.max_steps)
+            final_score = np.where(truncated, engine.score, final_score)
+            engine.reset(truncated)
+        # Games still running moved one cell; patch head, tail and apple
+        alive = np.flatnonzero(~(terminated | truncated))
+        board = engine.current_board[alive]
+        flat[alive, board, head[alive], OBS_HEAD] = 0
+        new_head = engine.head_y[alive] * width + engine.head_x[alive]
+        flat[alive, board, new_head, OBS_BODY] = OBS_ON
+        flat[alive, board, new_head, OBS_HEAD] = OBS_ON
+        popped = alive[engine.body_len[alive] == body_len[alive]]
+        flat[popped, engine.current_board[popped], tail[popped], OBS_BODY] = 0
+        moved = alive[(engine.apple_board[alive] != apple_board[alive]) | (engine.apple_cell[alive] != apple_cell[alive])]
+        flat[moved, apple_board[moved], apple_cell[moved], OBS_APPLE] = 0
+        flat[moved, engine.apple_board[moved], engine.apple_cell[moved], OBS_APPLE] = OBS_ON
+        restarted = np.flatnonzero(terminated | truncated)
+        if restarted.size:
+            self.write_games(restarted)
+        # A game only ends on a tick where it ate by winning
+        rewards = ate * np.float32(REWARD_APPLE)
+        rewards[terminated & ~ate] += REWARD_DEATH
+        return obs, rewards, terminated, truncated, self.info(final_score)
+
+    def info(self, final_score):
+        engine = self.engine
+        return {'score': engine.score, 'length': engine.length, 'final_score': final_score,
+                'current_board': engine.current_board, 'apple_board': engine.apple_board}
+
+    def write_games(self, games):
+        # Observations of freshly reset games, whose body is just the head
+        engine = self.engine
+        obs = self.obs
+        flat = self.flat
+        board = engine.current_board[games]
+        head = engine.head_y[games] * engine.board_size[0] + engine.head_x[games]
+        obs[games] = 0
+        obs[games, board, :, :, OBS_BOARD] = OBS_ON
+        flat[games, board, head, OBS_BODY] = OBS_ON
+        flat[games, board, head, OBS_HEAD] = OBS_ON
+        placed = games[engine.apple_cell[games] >= 0]
+        flat[placed, engine.apple_board[placed], engine.apple_cell[placed], OBS_APPLE] = OBS_ON
+
+
+def measure_steps_per_second(num_envs=1024, steps=500, seed=0):
+    # Environment steps per second with random actions
+    import time
+    env = VecSnakeEnv(num_envs, seed)
+    rng = np.random.default_rng(seed)
+    actions = rng.integers(0, ACTION_COUNT, (steps, num_envs)).astype(np.int8)
+    start = time.perf_counter()
+    for t in range(steps):
+        env.step(actions[t])
+    return num_envs * steps / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    print(f'{measure_steps_per_second():,.0f} env-steps/sec (vectorized)')
@@ -1,13 +1,27 @@
+import argparse
+import sys
+import time
+
+IMPORTED = time.perf_counter()  # before pygame loads; the startup report counts from here
+
 import pygame
-import random
+
+from snake_autopilot import Autopilot
+from snake_engine import BOARD_COUNT, BOARD_SIZE, DOWN, LEFT, RIGHT, TICK_RATE, UP, FixedTimestep, SnakeEngine
+from snake_palette import GradientCache, blend_color
+from snake_profiler import FrameProfiler
+from snake_render import SurfaceCache, TextCache, load_font
+from snake_replay import ReplayPlayer, ReplayRecorder, check_settings
 
 # Game settings
-BOARD_SIZE = (20, 20)  # 20x20 grid
 CELL_SIZE = 25
-PLAY_AREA_SIZE = (BOARD_SIZE[0] * CELL_SIZE, BOARD_SIZE[1] * CELL_SIZE)
+VIEWPORT_SIZE = (20, 20)  # cells shown at once; larger boards scroll
+CAMERA_MARGIN = 4  # cells kept between the head and the viewport edge
+PLAY_AREA_SIZE = (VIEWPORT_SIZE[0] * CELL_SIZE, VIEWPORT_SIZE[1] * CELL_SIZE)
 INFO_BAR_HEIGHT = 120
 SCREEN_SIZE = (PLAY_AREA_SIZE[0], PLAY_AREA_SIZE[1] + INFO_BAR_HEIGHT)
-FPS = 10
+RENDER_FPS = 60  # frames per second; the game speed is TICK_RATE
+PROFILER_HUD_INTERVAL = 15  # frames between profiler HUD refreshes
 
 import colorsys
 # Preset color options
@@ -20,31 +34,99 @@ PRESET_SNAKE_COLORS = [
 BOARD_COLORS = [PRESET_BG_COLORS[0], PRESET_BG_COLORS[1], PRESET_BG_COLORS[2]]
 SNAKE_BASE_COLORS = [PRESET_SNAKE_COLORS[0], PRESET_SNAKE_COLORS[1], PRESET_SNAKE_COLORS[2]]
 
+def ensure_board_colors(count):
+    # Give boards beyond the third their own colors, cycling the presets
+    while len(BOARD_COLORS) < count:
+        i = len(BOARD_COLORS)
+        BOARD_COLORS.append(PRESET_BG_COLORS[i % len(PRESET_BG_COLORS)])
+        SNAKE_BASE_COLORS.append(PRESET_SNAKE_COLORS[i % len(PRESET_SNAKE_COLORS)])
+
 # Apple colors
 APPLE_COLOR = (255, 0, 0)
 GLOWING_COLOR = (255, 255, 100)
 TRANSPARENT_COLOR = (255, 0, 0, 80)
 
+# Color grid overlay layout; the grid is centred, 100 pixels from the top
+COLOR_GRID_CELL = 24
+COLOR_GRID_COLUMNS = 18
+COLOR_GRID_ROWS = 12
+
+def screen_layout(board_size, viewport=VIEWPORT_SIZE):
+    # (viewport cells, play area pixels, screen pixels) for a board. The
+    # window follows the viewport but never gets smaller than the default
+    # one, so the info bar and the color menus always fit.
+    viewport = (min(board_size[0], viewport[0]), min(board_size[1], viewport[1]))
+    play_area = (viewport[0] * CELL_SIZE, viewport[1] * CELL_SIZE)
+    screen = (max(play_area[0], SCREEN_SIZE[0]), max(play_area[1], PLAY_AREA_SIZE[1]) + INFO_BAR_HEIGHT)
+    return viewport, play_area, screen
+
 class SnakeGame:
-    def __init__(self):
-        pygame.init()
-        self.screen = pygame.display.set_mode(SCREEN_SIZE)
-        pygame.display.set_caption('Multi-Board Snake')
+    def __init__(self, seed=None, dirty_rendering=False, record=None,
+                 board_size=BOARD_SIZE, board_count=BOARD_COUNT, viewport=VIEWPORT_SIZE, autopilot=False, screen=None):
+        self.created = time.perf_counter()
+        self.first_frame_time = None  # seconds from here to the first flip
+        self.startup_report = False
+        # Inputs go to `controls`: the engine itself, or a recorder wrapping it
+        if record:
+            self.recorder = ReplayRecorder.open(record, seed, board_size, board_count)
+            self.engine = self.recorder.engine
+            self.controls = self.recorder
+        else:
+            self.recorder = None
+            self.engine = self.controls = SnakeEngine(seed, board_size, board_count)
+        self.player = None
+        self.autopilot = Autopilot(self.engine) if autopilot else None
+        ensure_board_colors(board_count)
+        # Only the cells inside the viewport are drawn; the camera is the
+        # board cell at its top-left corner and follows the head
+        self.viewport, self.play_area_size, self.screen_size = screen_layout(board_size, viewport)
+        self.color_grid_origin = (self.screen_size[0]//2-180, 100)
+        self.camera = (0, 0)
+        self.follow_head()
+        self.profiler = FrameProfiler()
+        self.profiler_hud = ''
+        self.hud_text = None
+        self.dirty_rendering = dirty_rendering
+        # Only the subsystems the game uses; pygame.init() would also start
+        # audio and joysticks
+        pygame.font.init()
+        # Draws to `screen` when given (an off-screen surface of
+        # screen_layout() size), otherwise opens the window
+        self.windowed = screen is None
+        if self.windowed:
+            pygame.display.init()
+            screen = pygame.display.set_mode(self.screen_size)
+            pygame.display.set_caption('Multi-Board Snake')
+        self.screen = screen
         self.clock = pygame.time.Clock()
-        self.font = pygame.font.SysFont('Arial', 24)
+        self.font = load_font('Arial', 24)
+        self.text = TextCache(self.font)
+        self.surfaces = SurfaceCache()
         self.snake_color_transition = None  # (from_color, to_color, step)
+        self.palette = GradientCache()
         self.in_color_menu = False
         self.color_menu_board = 0
         self.color_menu_type = 'snake'  # 'snake' or 'bg'
-        self.color_menu_snake_idx = [0, 1, 2]
-        self.color_menu_bg_idx = [0, 1, 2]
+        self.color_menu_snake_idx = [i % len(PRESET_SNAKE_COLORS) for i in range(board_count)]
+        self.color_menu_bg_idx = [i % len(PRESET_BG_COLORS) for i in range(board_count)]
         self.in_color_picker = False
         self.color_picker_value = ''
         self.in_color_grid = False
         self.color_grid_cursor = [0, 0]
-        self.color_grid = self.generate_color_grid()
-        self.game_over = False
-        self.reset()
+        self.color_grid_colors = None  # built the first time the grid opens
+        # What the dirty-rect renderer last pushed to the display
+        self.drawn_signature = None
+        self.drawn_snake = None
+        self.drawn_cells = set()
+        self.drawn_apple = None
+        self.drawn_info = None
+        self.drawn_motion = ()
+    @property
+    def color_grid(self):
+        if self.color_grid_colors is None:
+            self.color_grid_colors = self.generate_color_grid()
+        return self.color_grid_colors
+
     def generate_color_grid(self):
         # Generate a grid of 18x12 colors (216 colors, like Paint)
         grid = []
@@ -63,40 +145,41 @@ class SnakeGame:
                     row.append((int(r*255), int(g*255), int(b*255)))
             grid.append(row)
         return grid
-        self.reset()
+
+    @classmethod
+    def play_replay(cls, replay, speed=1.0, **kwargs):
+        # Shows a recorded game in a window at `speed` times normal speed
+        game = cls(board_size=replay.board_size, board_count=replay.board_count, **kwargs)
+        game.player = ReplayPlayer(replay, target=game)
+        game.engine = game.controls = game.player.engine
+        game.run(TICK_RATE * speed)
 
     def reset(self):
-        self.snake = [[10, 10]]
-        self.direction = (0, -1)
-        self.length = 3
-        self.score = 0
-        self.current_board = 1  # 0, 1, 2
-        self.apple_board = random.randint(0, 2)
-        self.apple_pos = self.random_apple_pos()
-        self.game_over = False
+        self.controls.reset()
         self.snake_color_transition = None
 
-    def random_apple_pos(self):
-        while True:
-            pos = [random.randint(0, BOARD_SIZE[0]-1), random.randint(0, BOARD_SIZE[1]-1)]
-            if pos not in self.snake:
-                return pos
+    def queue_direction(self, direction):
+        return self.controls.queue_direction(direction)
 
     def handle_input(self):
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 return False
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                # Profiler HUD, available in every mode
+                self.profiler.toggle()
+                self.profiler_hud = ''
             elif event.type == pygame.KEYDOWN:
                 if self.in_color_grid:
                     # Color grid controls
                     if event.key == pygame.K_LEFT:
-                        self.color_grid_cursor[0] = (self.color_grid_cursor[0] - 1) % 18
+                        self.color_grid_cursor[0] = (self.color_grid_cursor[0] - 1) % COLOR_GRID_COLUMNS
                     elif event.key == pygame.K_RIGHT:
-                        self.color_grid_cursor[0] = (self.color_grid_cursor[0] + 1) % 18
+                        self.color_grid_cursor[0] = (self.color_grid_cursor[0] + 1) % COLOR_GRID_COLUMNS
                     elif event.key == pygame.K_UP:
-                        self.color_grid_cursor[1] = (self.color_grid_cursor[1] - 1) % 12
+                        self.color_grid_cursor[1] = (self.color_grid_cursor[1] - 1) % COLOR_GRID_ROWS
                     elif event.key == pygame.K_DOWN:
-                        self.color_grid_cursor[1] = (self.color_grid_cursor[1] + 1) % 12
+                        self.color_grid_cursor[1] = (self.color_grid_cursor[1] + 1) % COLOR_GRID_ROWS
                     elif event.key == pygame.K_RETURN:
                         color = self.color_grid[self.color_grid_cursor[1]][self.color_grid_cursor[0]]
                         if self.color_menu_type == 'snake':
@@ -132,12 +215,13 @@ class SnakeGame:
                             self.color_picker_value += event.unicode
                 elif self.in_color_menu:
                     # Color menu controls
-                    if event.key == pygame.K_1:
-                        self.color_menu_board = 0
-                    elif event.key == pygame.K_2:
-                        self.color_menu_board = 1
-                    elif event.key == pygame.K_3:
-                        self.color_menu_board = 2
+                    if pygame.K_1 <= event.key <= pygame.K_9:
+                        if event.key - pygame.K_1 < self.engine.board_count:
+                            self.color_menu_board = event.key - pygame.K_1
+                    elif event.key == pygame.K_PAGEUP:
+                        self.color_menu_board = (self.color_menu_board - 1) % self.engine.board_count
+                    elif event.key == pygame.K_PAGEDOWN:
+                        self.color_menu_board = (self.color_menu_board + 1) % self.engine.board_count
                     elif event.key == pygame.K_s:
                         self.color_menu_type = 'snake' if self.color_menu_type == 'bg' else 'bg'
                     elif event.key == pygame.K_LEFT:
@@ -155,40 +239,28 @@ class SnakeGame:
                         self.color_grid_cursor = [0, 0]
                     elif event.key == pygame.K_RETURN:
                         # Apply changes
-                        for i in range(3):
+                        for i in range(self.engine.board_count):
                             SNAKE_BASE_COLORS[i] = PRESET_SNAKE_COLORS[self.color_menu_snake_idx[i]]
                             BOARD_COLORS[i] = PRESET_BG_COLORS[self.color_menu_bg_idx[i]]
                         self.in_color_menu = False
                     elif event.key == pygame.K_ESCAPE:
                         self.in_color_menu = False
-                else:
+                elif self.player is None:
                     if event.key == pygame.K_UP:
-                        if self.direction != (0, 1):
-                            self.direction = (0, -1)
+                        self.queue_direction(UP)
                     elif event.key == pygame.K_DOWN:
-                        if self.direction != (0, -1):
-                            self.direction = (0, 1)
+                        self.queue_direction(DOWN)
                     elif event.key == pygame.K_LEFT:
-                        if self.direction != (1, 0):
-                            self.direction = (-1, 0)
+                        self.queue_direction(LEFT)
                     elif event.key == pygame.K_RIGHT:
-                        if self.direction != (-1, 0):
-                            self.direction = (1, 0)
+                        self.queue_direction(RIGHT)
                     elif event.key == pygame.K_w:
-                        if self.current_board > 0:
-                            from_color = self.get_snake_color()
-                            self.current_board -= 1
-                            to_color = self.get_snake_color()
-                            self.snake_color_transition = (from_color, to_color, 0)
+                        self.switch_board(-1)
                     elif event.key == pygame.K_s:
-                        if self.current_board < 2:
-                            from_color = self.get_snake_color()
-                            self.current_board += 1
-                            to_color = self.get_snake_color()
-                            self.snake_color_transition = (from_color, to_color, 0)
+                        self.switch_board(1)
                     elif event.key == pygame.K_c:
                         self.in_color_menu = True
-                    elif event.key == pygame.K_r and self.game_over:
+                    elif event.key == pygame.K_r and self.engine.game_over:
                         self.reset()
         # Mouse click support for color menu (open grid only on click down, not hold)
         if self.in_color_menu:
@@ -196,8 +268,8 @@ class SnakeGame:
             if mouse_pressed and not hasattr(self, 'mouse_was_down'):
                 self.mouse_was_down = True
                 mx, my = pygame.mouse.get_pos()
-                bg_rect = pygame.Rect(SCREEN_SIZE[0]//2-120, 270, 60, 60)
-                snake_rect = pygame.Rect(SCREEN_SIZE[0]//2-40, 270, 60, 60)
+                bg_rect = pygame.Rect(self.screen_size[0]//2-120, 270, 60, 60)
+                snake_rect = pygame.Rect(self.screen_size[0]//2-40, 270, 60, 60)
                 if bg_rect.collidepoint(mx, my):
                     self.color_menu_type = 'bg'
                     self.in_color_grid = True
@@ -214,47 +286,41 @@ class SnakeGame:
             mouse_pressed = pygame.mouse.get_pressed()[0]
             if mouse_pressed and not hasattr(self, 'mouse_grid_was_down'):
                 self.mouse_grid_was_down = True
-                mx, my = pygame.mouse.get_pos()
-                grid_x = SCREEN_SIZE[0]//2-180
-                grid_y = 100
-                cell_size = 24
-                for y, row in enumerate(self.color_grid):
-                    for x, color in enumerate(row):
-                        rect = pygame.Rect(grid_x + x*cell_size, grid_y + y*cell_size, cell_size, cell_size)
-                        if rect.collidepoint(mx, my):
-                            self.color_grid_cursor = [x, y]
-                            # Save and apply the selected color immediately
-                            color = self.color_grid[y][x]
-                            if self.color_menu_type == 'snake':
-                                SNAKE_BASE_COLORS[self.color_menu_board] = color
-                                self.color_menu_snake_idx[self.color_menu_board] = -1
-                            else:
-                                BOARD_COLORS[self.color_menu_board] = color
-                                self.color_menu_bg_idx[self.color_menu_board] = -1
-                            self.in_color_grid = False
-                            break
+                cell = self.color_grid_cell_at(*pygame.mouse.get_pos())
+                if cell is not None:
+                    x, y = cell
+                    self.color_grid_cursor = [x, y]
+                    # Save and apply the selected color immediately
+                    color = self.color_grid[y][x]
+                    if self.color_menu_type == 'snake':
+                        SNAKE_BASE_COLORS[self.color_menu_board] = color
+                        self.color_menu_snake_idx[self.color_menu_board] = -1
+                    else:
+                        BOARD_COLORS[self.color_menu_board] = color
+                        self.color_menu_bg_idx[self.color_menu_board] = -1
+                    self.in_color_grid = False
             elif not mouse_pressed:
                 if hasattr(self, 'mouse_grid_was_down'):
                     delattr(self, 'mouse_grid_was_down')
         return True
+    def switch_board(self, delta):
+        # Switch boards and start the two-step snake color transition
+        from_color = self.get_snake_color()
+        if not self.controls.switch_board(delta):
+            return False
+        to_color = self.get_snake_color()
+        self.snake_color_transition = (from_color, to_color, 0)
+        self.palette.prime_transition(from_color, to_color, len(self.engine.snake))
+        return True
+
     def get_snake_color(self):
         # Returns the base color for the current board
-        return SNAKE_BASE_COLORS[self.current_board]
+        return SNAKE_BASE_COLORS[self.engine.current_board]
 
     def get_gradient_colors(self, base_color, length):
-        # Returns a list of colors from dark (head) to light (tail)
-        r, g, b = base_color
-        h, s, v = colorsys.rgb_to_hsv(r/255, g/255, b/255)
-        colors = []
-        for i in range(length):
-            # Head is darkest, tail is lightest
-            factor = 0.5 + 0.5 * (i / max(1, length-1))  # 0.5 to 1.0
-            new_v = min(1.0, v * factor)
-            new_s = min(1.0, s * (0.8 + 0.2 * (i / max(1, length-1))))
-            new_h = h + 0.05 * (i / max(1, length-1))  # slight hue shift
-            r2, g2, b2 = colorsys.hsv_to_rgb(new_h, new_s, new_v)
-            colors.append((int(r2*255), int(g2*255), int(b2*255)))
-        return colors
+        # Returns a list of colors from dark (head) to light (tail); cached,
+        # so callers must not modify it
+        return self.palette.get(base_color, length)
 
     def get_transition_color(self):
         # Handles the two-step color transition
@@ -263,61 +329,269 @@ class SnakeGame:
         from_color, to_color, step = self.snake_color_transition
         if step == 0:
             # Intermediate color: average
-            mid_color = tuple((f+t)//2 for f, t in zip(from_color, to_color))
-            self.snake_color_transition = (from_color, to_color, 1)
-            return mid_color
+            return blend_color(from_color, to_color)
         else:
             # Final color
-            self.snake_color_transition = None
             return to_color
 
+    def advance_color_transition(self):
+        # The transition moves one step per game tick, not per frame
+        if self.snake_color_transition:
+            from_color, to_color, step = self.snake_color_transition
+            if step == 0:
+                self.snake_color_transition = (from_color, to_color, 1)
+            else:
+                self.snake_color_transition = None
+
     def update(self):
-        if self.game_over:
-            return
-        head = [self.snake[0][0] + self.direction[0], self.snake[0][1] + self.direction[1]]
-        # Check wall collision
-        if not (0 <= head[0] < BOARD_SIZE[0] and 0 <= head[1] < BOARD_SIZE[1]):
-            self.game_over = True
+        self.controls.update()
+        self.advance_color_transition()
+
+    def tick(self):
+        # One game tick, driven by the keyboard, the autopilot or the replay
+        # being played
+        if self.player is not None:
+            self.player.advance()
             return
-        # Check self collision
-        if head in self.snake:
-            self.game_over = True
+        if self.autopilot is not None:
+            # Inputs go through the game so they are recorded and animated
+            self.autopilot.step(self)
+        self.update()
+
+    def motion_cells(self):
+        # The cell the head moves into on the next tick and the tail cell it
+        # leaves behind; None where nothing will move
+        engine = self.engine
+        if engine.game_over:
+            return None, None
+        dx, dy = engine.next_direction()
+        x, y = engine.snake[0]
+        lead = (x + dx, y + dy)
+        if not (0 <= lead[0] < engine.board_size[0] and 0 <= lead[1] < engine.board_size[1]) or lead in engine.occupancy:
+            return None, None
+        eating = engine.current_board == engine.apple_board and lead == engine.apple_pos
+        if eating or len(engine.snake) < engine.length or len(engine.snake) < 2:
+            return lead, None
+        return lead, engine.snake[-1]
+
+    def follow_head(self):
+        # Scroll the viewport, keeping the head CAMERA_MARGIN cells from its
+        # edges; the camera only moves when the head gets that close
+        camera = list(self.camera)
+        for axis in (0, 1):
+            head = self.engine.snake[0][axis]
+            view = self.viewport[axis]
+            margin = min(CAMERA_MARGIN, (view - 1) // 2)
+            if head < camera[axis] + margin:
+                camera[axis] = head - margin
+            elif head > camera[axis] + view - 1 - margin:
+                camera[axis] = head - view + 1 + margin
+            camera[axis] = max(0, min(camera[axis], self.engine.board_size[axis] - view))
+        self.camera = tuple(camera)
+
+    def in_view(self, cell):
+        return (self.camera[0] <= cell[0] < self.camera[0] + self.viewport[0]
+                and self.camera[1] <= cell[1] < self.camera[1] + self.viewport[1])
+
+    def cell_rect(self, cell):
+        # Screen rect of a board cell inside the viewport
+        return pygame.Rect((cell[0] - self.camera[0])*CELL_SIZE, (cell[1] - self.camera[1])*CELL_SIZE + INFO_BAR_HEIGHT,
+                           CELL_SIZE, CELL_SIZE)
+
+    def visible_segments(self):
+        # (index from the head, cell) for each snake segment in the viewport.
+        # Walks the body or the viewport, whichever is smaller, so the cost
+        # never depends on the board size.
+        engine = self.engine
+        cx, cy = self.camera
+        vw, vh = self.viewport
+        if len(engine.snake) <= vw * vh:
+            return [(idx, cell) for idx, cell in enumerate(engine.snake)
+                    if cx <= cell[0] < cx + vw and cy <= cell[1] < cy + vh]
+        occupancy = engine.occupancy
+        head = engine.head_serial
+        segments = []
+        for y in range(cy, cy + vh):
+            for x in range(cx, cx + vw):
+                serial = occupancy.get((x, y))
+                if serial is not None:
+                    segments.append((head - serial, (x, y)))
+        return segments
+
+    def edge_rect(self, cell, side, size):
+        # Strip of a cell, `size` pixels thick, along the edge facing `side`
+        x, y = self.cell_rect(cell).topleft
+        if side[0] > 0:
+            return pygame.Rect(x + CELL_SIZE - size, y, size, CELL_SIZE)
+        if side[0] < 0:
+            return pygame.Rect(x, y, size, CELL_SIZE)
+        if side[1] > 0:
+            return pygame.Rect(x, y + CELL_SIZE - size, CELL_SIZE, size)
+        return pygame.Rect(x, y, CELL_SIZE, size)
+
+    def draw_motion(self, alpha, head_color):
+        # Interpolate between ticks: slide the head into its next cell and
+        # retract the tail by the fraction of the tick that has elapsed
+        size = int(alpha * CELL_SIZE)
+        if size <= 0:
             return
-        self.snake.insert(0, head)
-        if self.current_board == self.apple_board and head == self.apple_pos:
-            self.length += 1
-            self.score += 1
-            self.apple_board = random.randint(0, 2)
-            self.apple_pos = self.random_apple_pos()
-        if len(self.snake) > self.length:
-            self.snake.pop()
-
-    def draw_board(self):
+        engine = self.engine
+        lead, tail = self.motion_cells()
+        if lead is not None and self.in_view(lead):
+            head = engine.snake[0]
+            self.screen.fill(head_color, self.edge_rect(lead, (head[0]-lead[0], head[1]-lead[1]), size))
+        if tail is not None and self.in_view(tail):
+            prev = engine.snake[-2]
+            self.screen.fill(BOARD_COLORS[engine.current_board], self.edge_rect(tail, (tail[0]-prev[0], tail[1]-prev[1]), size))
+
+    def draw_board(self, alpha=0.0):
+        engine = self.engine
         # Draw play area
         self.screen.fill((30, 30, 30))
-        play_area_rect = pygame.Rect(0, INFO_BAR_HEIGHT, PLAY_AREA_SIZE[0], PLAY_AREA_SIZE[1])
-        pygame.draw.rect(self.screen, BOARD_COLORS[self.current_board], play_area_rect)
+        play_area_rect = pygame.Rect(0, INFO_BAR_HEIGHT, self.play_area_size[0], self.play_area_size[1])
+        pygame.draw.rect(self.screen, BOARD_COLORS[engine.current_board], play_area_rect)
         # Determine snake color (with transition)
         base_color = self.get_transition_color()
-        gradient_colors = self.get_gradient_colors(base_color, len(self.snake))
+        gradient_colors = self.get_gradient_colors(base_color, len(engine.snake))
         # Draw snake with gradient
-        for idx, segment in enumerate(self.snake):
-            pygame.draw.rect(
-                self.screen,
-                gradient_colors[idx],
-                (segment[0]*CELL_SIZE, segment[1]*CELL_SIZE + INFO_BAR_HEIGHT, CELL_SIZE, CELL_SIZE)
-            )
+        for idx, segment in self.visible_segments():
+            pygame.draw.rect(self.screen, gradient_colors[idx], self.cell_rect(segment))
+        self.draw_motion(alpha, gradient_colors[0])
         # Draw apple
-        apple_rect = (self.apple_pos[0]*CELL_SIZE, self.apple_pos[1]*CELL_SIZE + INFO_BAR_HEIGHT, CELL_SIZE, CELL_SIZE)
-        if self.apple_board == self.current_board:
+        if engine.apple_pos is not None and self.in_view(engine.apple_pos):
+            self.draw_apple()
+        self.draw_info_bar()
+        # Draw color menu overlay
+        if self.in_color_menu:
+            self.draw_color_menu()
+        if self.in_color_grid:
+            self.draw_color_grid()
+
+    def draw_info_bar(self):
+        # Draw info bar (score, board, instructions)
+        engine = self.engine
+        info_y = 10
+        score_text = self.text.slot('score', f'Score: {engine.score}', (255,255,255))
+        self.screen.blit(score_text, (10, info_y))
+        board_text = self.text.slot('board', f'Board: {engine.current_board+1}', (255,255,255))
+        self.screen.blit(board_text, (180, info_y))
+        color_instr1 = self.text.render('Press C to change colors for snake/background', (200,200,200))
+        self.screen.blit(color_instr1, (350, info_y))
+        color_instr2 = self.text.render('Use W/S to switch boards', (200,200,200))
+        self.screen.blit(color_instr2, (350, info_y+30))
+        if engine.won:
+            over_text = self.text.render('You win! Press R to restart.', (0,255,0))
+            self.screen.blit(over_text, (10, info_y+60))
+        elif engine.game_over:
+            over_text = self.text.render('Game Over! Press R to restart.', (255,0,0))
+            self.screen.blit(over_text, (10, info_y+60))
+        if self.profiler_hud:
+            if self.hud_text is None:
+                # Smaller font, only loaded once the profiler is used
+                self.hud_text = TextCache(load_font('Arial', 16))
+            hud_text = self.hud_text.slot('profiler', self.profiler_hud, (120,220,120))
+            self.screen.blit(hud_text, (10, info_y+90))
+
+    def frame_signature(self):
+        # State whose change invalidates the whole frame
+        return (self.engine.current_board, tuple(BOARD_COLORS), tuple(SNAKE_BASE_COLORS),
+                self.in_color_menu, self.in_color_grid, self.in_color_picker, self.camera)
+
+    def draw_dirty(self, alpha=0.0):
+        # Repaint only what changed since the last frame and return the
+        # damaged screen rects. Board switches, color changes, overlays and
+        # the color transition fall back to a full redraw, as does scrolling.
+        engine = self.engine
+        signature = self.frame_signature()
+        snake_key = (engine.snake[0], engine.snake[-1], len(engine.snake))
+        apple = (engine.apple_pos, engine.apple_board)
+        info = (engine.score, engine.current_board, engine.game_over, engine.won, self.profiler_hud)
+        full = (signature != self.drawn_signature or self.in_color_menu
+                or self.in_color_grid or self.snake_color_transition is not None)
+        segments = self.visible_segments()
+        cells = {cell for _, cell in segments}
+        motion = self.motion_cells() if int(alpha * CELL_SIZE) > 0 else ()
+        rects = []
+        if full:
+            self.draw_board(alpha)
+            rects.append(self.screen.get_rect())
+        else:
+            damaged = self.drawn_cells - cells
+            if snake_key != self.drawn_snake:
+                # The gradient runs head to tail, so every segment shifts color
+                damaged |= cells
+            if apple != self.drawn_apple:
+                damaged.add(self.drawn_apple[0])
+                damaged.add(engine.apple_pos)
+            # Interpolated head and tail cells change on every frame
+            damaged.update(motion)
+            damaged.update(self.drawn_motion)
+            damaged = {cell for cell in damaged if cell is not None and self.in_view(cell)}
+            if damaged:
+                background = BOARD_COLORS[engine.current_board]
+                for cell in damaged:
+                    rect = self.cell_rect(cell)
+                    self.screen.fill(background, rect)
+                    rects.append(rect)
+                gradient_colors = self.get_gradient_colors(self.get_snake_color(), len(engine.snake))
+                for idx, segment in segments:
+                    if segment in damaged:
+                        pygame.draw.rect(self.screen, gradient_colors[idx], self.cell_rect(segment))
+                self.draw_motion(alpha, gradient_colors[0])
+                # The apple is drawn on top of the snake, as in draw_board()
+                if engine.apple_pos in damaged:
+                    self.draw_apple()
+            if info != self.drawn_info:
+                info_rect = pygame.Rect(0, 0, self.screen_size[0], INFO_BAR_HEIGHT)
+                self.screen.fill((30, 30, 30), info_rect)
+                self.draw_info_bar()
+                rects.append(info_rect)
+        self.drawn_signature = signature
+        self.drawn_snake = snake_key
+        self.drawn_cells = cells
+        self.drawn_apple = apple
+        self.drawn_info = info
+        self.drawn_motion = motion
+        return rects
+
+    def render(self, alpha=0.0):
+        # Draw the frame; alpha is the fraction of the current tick that has
+        # elapsed, for interpolated movement. Returns the damaged rects, or
+        # None when the whole screen was drawn.
+        self.follow_head()
+        if self.dirty_rendering:
+            return self.draw_dirty(alpha)
+        self.draw_board(alpha)
+        return None
+
+    def flip(self, rects):
+        # Push a rendered frame to the display (off-screen games have none)
+        if self.windowed:
+            if rects is None:
+                pygame.display.flip()
+            elif rects:
+                pygame.display.update(rects)
+        if self.first_frame_time is None:
+            now = time.perf_counter()
+            self.first_frame_time = now - self.created
+            if self.startup_report:
+                print(f'first frame {(now - IMPORTED) * 1000:.1f} ms after snake_game was imported, '
+                      f'{self.first_frame_time * 1000:.1f} ms after SnakeGame()', file=sys.stderr, flush=True)
+
+    def present(self, alpha=0.0):
+        self.flip(self.render(alpha))
+
+    def draw_apple(self):
+        engine = self.engine
+        apple_rect = self.cell_rect(engine.apple_pos)
+        if engine.apple_board == engine.current_board:
             color = APPLE_COLOR
-        elif self.apple_board < self.current_board:
+        elif engine.apple_board < engine.current_board:
             color = GLOWING_COLOR
         else:
             color = TRANSPARENT_COLOR
         if color == TRANSPARENT_COLOR:
-            surf = pygame.Surface((CELL_SIZE, CELL_SIZE), pygame.SRCALPHA)
-            surf.fill(color)
+            surf = self.surfaces.get('ghost_apple', color, lambda: self.build_ghost_apple(color))
             self.screen.blit(surf, (apple_rect[0], apple_rect[1]))
         else:
             pygame.draw.ellipse(
@@ -325,60 +599,65 @@ class SnakeGame:
                 color,
                 apple_rect
             )
-        # Draw info bar (score, board, instructions)
-        info_y = 10
-        score_text = self.font.render(f'Score: {self.score}', True, (255,255,255))
-        self.screen.blit(score_text, (10, info_y))
-        board_text = self.font.render(f'Board: {self.current_board+1}', True, (255,255,255))
-        self.screen.blit(board_text, (180, info_y))
-        color_instr1 = self.font.render('Press C to change colors for snake/background', True, (200,200,200))
-        self.screen.blit(color_instr1, (350, info_y))
-        color_instr2 = self.font.render('Use W/S to switch boards', True, (200,200,200))
-        self.screen.blit(color_instr2, (350, info_y+30))
-        if self.game_over:
-            over_text = self.font.render('Game Over! Press R to restart.', True, (255,0,0))
-            self.screen.blit(over_text, (10, info_y+60))
-        # Draw color menu overlay
-        if self.in_color_menu:
-            self.draw_color_menu()
-        if self.in_color_grid:
-            self.draw_color_grid()
-    def draw_color_grid(self):
-        # Draws the color grid overlay
-        overlay = pygame.Surface(SCREEN_SIZE)
-        overlay.set_alpha(230)
-        overlay.fill((20, 20, 20))
-        self.screen.blit(overlay, (0, 0))
-        title = self.font.render('Select a color (Arrow keys, Enter, Esc)', True, (255,255,255))
-        self.screen.blit(title, (SCREEN_SIZE[0]//2-180, 60))
-        grid_x = SCREEN_SIZE[0]//2-180
-        grid_y = 100
-        cell_size = 24
+
+    def build_ghost_apple(self, color):
+        surf = pygame.Surface((CELL_SIZE, CELL_SIZE), pygame.SRCALPHA)
+        surf.fill(color)
+        return surf
+
+    def build_color_grid_surface(self):
+        # All grid cells pre-drawn once; the cursor is drawn on top per frame
+        surface = pygame.Surface((COLOR_GRID_COLUMNS*COLOR_GRID_CELL, COLOR_GRID_ROWS*COLOR_GRID_CELL))
         for y, row in enumerate(self.color_grid):
             for x, color in enumerate(row):
-                rect = pygame.Rect(grid_x + x*cell_size, grid_y + y*cell_size, cell_size, cell_size)
-                pygame.draw.rect(self.screen, color, rect)
-                if [x, y] == self.color_grid_cursor:
-                    pygame.draw.rect(self.screen, (255,255,255), rect, 2)
-        info = self.font.render('Enter: select, Esc: cancel', True, (200,200,200))
-        self.screen.blit(info, (SCREEN_SIZE[0]//2-180, grid_y + 12*cell_size + 10))
+                pygame.draw.rect(surface, color, (x*COLOR_GRID_CELL, y*COLOR_GRID_CELL, COLOR_GRID_CELL, COLOR_GRID_CELL))
+        return surface
+
+    def build_swatch(self, color, label, label_x):
+        # Opaque color box with its label, as shown in the color menu
+        surface = pygame.Surface((60, 60))
+        surface.fill(color)
+        surface.blit(self.text.render(label, (0,0,0)), (label_x, 15))
+        return surface
+
+    def color_grid_cell_at(self, mx, my):
+        # Grid cell under a screen position, or None outside the grid
+        x = (mx - self.color_grid_origin[0]) // COLOR_GRID_CELL
+        y = (my - self.color_grid_origin[1]) // COLOR_GRID_CELL
+        if 0 <= x < COLOR_GRID_COLUMNS and 0 <= y < COLOR_GRID_ROWS:
+            return x, y
+        return None
+
+    def draw_color_grid(self):
+        # Draws the color grid overlay
+        self.screen.blit(self.surfaces.backdrop(self.screen_size, (20, 20, 20), 230), (0, 0))
+        title = self.text.render('Select a color (Arrow keys, Enter, Esc)', (255,255,255))
+        self.screen.blit(title, (self.screen_size[0]//2-180, 60))
+        grid_x, grid_y = self.color_grid_origin
+        cell_size = COLOR_GRID_CELL
+        grid = self.surfaces.get('color_grid', (COLOR_GRID_COLUMNS, COLOR_GRID_ROWS), self.build_color_grid_surface)
+        self.screen.blit(grid, self.color_grid_origin)
+        x, y = self.color_grid_cursor
+        pygame.draw.rect(self.screen, (255,255,255), (grid_x + x*cell_size, grid_y + y*cell_size, cell_size, cell_size), 2)
+        info = self.text.render('Enter: select, Esc: cancel', (200,200,200))
+        self.screen.blit(info, (self.screen_size[0]//2-180, grid_y + COLOR_GRID_ROWS*cell_size + 10))
 
     def draw_color_menu(self):
         # Draws the color selection overlay
-        overlay = pygame.Surface(SCREEN_SIZE)
-        overlay.set_alpha(220)
-        overlay.fill((40, 40, 40))
-        self.screen.blit(overlay, (0, 0))
-        title = self.font.render('Color Selection Menu', True, (255,255,255))
-        self.screen.blit(title, (SCREEN_SIZE[0]//2-120, 30))
-        info1 = self.font.render('Press 1/2/3 to select board', True, (200,200,200))
-        self.screen.blit(info1, (SCREEN_SIZE[0]//2-120, 70))
-        info2 = self.font.render('Arrow keys to change color', True, (200,200,200))
-        self.screen.blit(info2, (SCREEN_SIZE[0]//2-120, 100))
-        info3 = self.font.render('S to switch snake/background', True, (200,200,200))
-        self.screen.blit(info3, (SCREEN_SIZE[0]//2-120, 130))
-        info4 = self.font.render('Enter to confirm, Esc to cancel', True, (200,200,200))
-        self.screen.blit(info4, (SCREEN_SIZE[0]//2-120, 160))
+        self.screen.blit(self.surfaces.backdrop(self.screen_size, (40, 40, 40), 220), (0, 0))
+        title = self.text.render('Color Selection Menu', (255,255,255))
+        self.screen.blit(title, (self.screen_size[0]//2-120, 30))
+        board_keys = '/'.join(str(i+1) for i in range(min(self.engine.board_count, 9)))
+        if self.engine.board_count > 9:
+            board_keys += ', PgUp/PgDn'
+        info1 = self.text.render(f'Press {board_keys} to select board', (200,200,200))
+        self.screen.blit(info1, (self.screen_size[0]//2-120, 70))
+        info2 = self.text.render('Arrow keys to change color', (200,200,200))
+        self.screen.blit(info2, (self.screen_size[0]//2-120, 100))
+        info3 = self.text.render('S to switch snake/background', (200,200,200))
+        self.screen.blit(info3, (self.screen_size[0]//2-120, 130))
+        info4 = self.text.render('Enter to confirm, Esc to cancel', (200,200,200))
+        self.screen.blit(info4, (self.screen_size[0]//2-120, 160))
         # Show current selection
         sel_board = self.color_menu_board
         sel_type = self.color_menu_type
@@ -393,25 +672,93 @@ class SnakeGame:
             sel_bg_color = BOARD_COLORS[sel_board]
         else:
             sel_bg_color = PRESET_BG_COLORS[sel_bg_idx]
-        board_text = self.font.render(f'Board: {sel_board+1}', True, (255,255,255))
-        self.screen.blit(board_text, (SCREEN_SIZE[0]//2-120, 200))
-        type_text = self.font.render(f'Editing: {sel_type.capitalize()} Color', True, (255,255,255))
-        self.screen.blit(type_text, (SCREEN_SIZE[0]//2-120, 230))
+        board_text = self.text.slot('menu_board', f'Board: {sel_board+1}', (255,255,255))
+        self.screen.blit(board_text, (self.screen_size[0]//2-120, 200))
+        type_text = self.text.slot('menu_type', f'Editing: {sel_type.capitalize()} Color', (255,255,255))
+        self.screen.blit(type_text, (self.screen_size[0]//2-120, 230))
         # Show color boxes
-        pygame.draw.rect(self.screen, sel_bg_color, (SCREEN_SIZE[0]//2-120, 270, 60, 60))
-        self.screen.blit(self.font.render('BG', True, (0,0,0)), (SCREEN_SIZE[0]//2-120+15, 270+15))
-        pygame.draw.rect(self.screen, sel_snake_color, (SCREEN_SIZE[0]//2-40, 270, 60, 60))
-        self.screen.blit(self.font.render('Snake', True, (0,0,0)), (SCREEN_SIZE[0]//2-40+5, 270+15))
+        bg_swatch = self.surfaces.get('bg_swatch', sel_bg_color, lambda: self.build_swatch(sel_bg_color, 'BG', 15))
+        self.screen.blit(bg_swatch, (self.screen_size[0]//2-120, 270))
+        snake_swatch = self.surfaces.get('snake_swatch', sel_snake_color, lambda: self.build_swatch(sel_snake_color, 'Snake', 5))
+        self.screen.blit(snake_swatch, (self.screen_size[0]//2-40, 270))
 
-    def run(self):
+    def run(self, tick_rate=TICK_RATE, render_fps=RENDER_FPS, profile_out=None):
+        # Fixed-timestep loop: the game advances tick_rate times per second
+        # however fast frames are drawn, and frames interpolate in between.
+        # Each phase is timed while the profiler is on (F3).
+        timestep = FixedTimestep(tick_rate)
+        profiler = self.profiler
         running = True
-        while running:
-            self.clock.tick(FPS)
-            running = self.handle_input()
-            self.update()
-            self.draw_board()
-            pygame.display.flip()
-        pygame.quit()
+        try:
+            while running:
+                profiling = profiler.enabled
+                if profiling:
+                    profiler.begin_frame()
+                elapsed = self.clock.tick(render_fps) / 1000.0
+                if profiling:
+                    profiler.mark('wait')
+                for _ in range(timestep.advance(elapsed)):
+                    self.tick()
+                if profiling:
+                    profiler.mark('update')
+                # Input is read after the ticks so a board switch is drawn this
+                # frame; queued turns are applied from the next tick
+                running = self.handle_input()
+                if profiling:
+                    profiler.mark('input')
+                    if profiler.frames % PROFILER_HUD_INTERVAL == 0:
+                        self.profiler_hud = profiler.hud_text()
+                rects = self.render(timestep.alpha)
+                if profiling:
+                    profiler.mark('draw')
+                self.flip(rects)
+                if profiling:
+                    profiler.end_frame('flip')
+        finally:
+            # Also on errors and Ctrl-C, so the recording gets its END event
+            if self.recorder is not None:
+                self.recorder.close()
+            pygame.quit()
+        if profile_out and profiler.count:
+            profiler.dump(profile_out)
+
+def cells_arg(text):
+    # Parses 'WxH' command line sizes
+    width, _, height = text.lower().partition('x')
+    return (int(width), int(height))
 
 if __name__ == '__main__':
-    SnakeGame().run()
+    parser = argparse.ArgumentParser(description='Multi-Board Snake')
+    parser.add_argument('--seed', type=int, help='seed for apple placement')
+    parser.add_argument('--dirty-rects', action='store_true',
+                        help='push only changed screen regions each frame')
+    parser.add_argument('--tick-rate', type=int, default=TICK_RATE,
+                        help='game ticks per second (game speed)')
+    parser.add_argument('--fps', type=int, default=RENDER_FPS,
+                        help='frames drawn per second')
+    parser.add_argument('--record', metavar='FILE',
+                        help='record the session to a replay file')
+    parser.add_argument('--profile', action='store_true',
+                        help='start with the frame profiler on (toggle with F3)')
+    parser.add_argument('--profile-out', metavar='FILE',
+                        help='write profiler timings on exit (.csv, or .json with a summary)')
+    parser.add_argument('--board-size', type=cells_arg, default=BOARD_SIZE, metavar='WxH',
+                        help='board size in cells')
+    parser.add_argument('--boards', type=int, default=BOARD_COUNT, help='number of boards')
+    parser.add_argument('--viewport', type=cells_arg, default=VIEWPORT_SIZE, metavar='WxH',
+                        help='cells shown at once; the view scrolls on larger boards and the window grows to fit')
+    parser.add_argument('--autopilot', action='store_true', help='let the computer play')
+    parser.add_argument('--startup-report', action='store_true',
+                        help='print the time to the first frame (interpreter startup not included)')
+    args = parser.parse_args()
+    if args.record:
+        try:
+            check_settings(args.board_size, args.boards)
+        except ValueError as error:
+            parser.error(str(error))
+    game = SnakeGame(args.seed, dirty_rendering=args.dirty_rects, record=args.record,
+                     board_size=args.board_size, board_count=args.boards, viewport=args.viewport,
+                     autopilot=args.autopilot)
+    game.profiler.enabled = args.profile
+    game.startup_report = args.startup_report
+    game.run(args.tick_rate, args.fps, profile_out=args.profile_out)
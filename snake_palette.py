@@ -0,0 +1,94 @@
+import colorsys
+from collections import OrderedDict
+
+# Snake gradient palettes.
+#
+# A gradient depends only on (base_color, length), so GradientCache keeps the
+# most recently used ones in a bounded LRU and frames with an unchanged snake
+# do no colour math at all. Every segment's shade is scaled by its position
+# relative to the whole body, so a longer snake needs a fresh gradient; the
+# base colour's HSV conversion is cached so that only happens once per apple.
+
+GRADIENT_CACHE_SIZE = 64
+GRADIENT_STEPS = 1024  # longer snakes share this many shades
+
+
+def gradient_colors(base_color, length, hsv=None):
+    # Returns a list of colors from dark (head) to light (tail)
+    if hsv is None:
+        r, g, b = base_color
+        hsv = colorsys.rgb_to_hsv(r/255, g/255, b/255)
+    h, s, v = hsv
+    colors = []
+    span = max(1, length-1)
+    for i in range(length):
+        # Head is darkest, tail is lightest
+        t = i / span
+        factor = 0.5 + 0.5 * t  # 0.5 to 1.0
+        new_v = min(1.0, v * factor)
+        new_s = min(1.0, s * (0.8 + 0.2 * t))
+        new_h = h + 0.05 * t  # slight hue shift
+        r2, g2, b2 = colorsys.hsv_to_rgb(new_h, new_s, new_v)
+        colors.append((int(r2*255), int(g2*255), int(b2*255)))
+    return colors
+
+
+def blend_color(from_color, to_color):
+    # Intermediate color of the two-step board switch transition
+    return tuple((f+t)//2 for f, t in zip(from_color, to_color))
+
+
+class StretchedGradient:
+    # Gradient of a snake longer than GRADIENT_STEPS: each segment takes the
+    # nearest of the precomputed shades, so memory and colour math stay
+    # bounded however long the snake gets
+    def __init__(self, colors, length):
+        self.colors = colors
+        self.length = length
+        self.scale = (len(colors) - 1) / max(1, length - 1)
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, idx):
+        return self.colors[int(idx * self.scale + 0.5)]
+
+
+class GradientCache:
+    def __init__(self, maxsize=GRADIENT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.gradients = OrderedDict()
+        self.hsv = {}
+
+    def get(self, base_color, length):
+        key = (tuple(base_color), length)
+        colors = self.gradients.get(key)
+        if colors is not None:
+            self.gradients.move_to_end(key)
+            return colors
+        if length > GRADIENT_STEPS:
+            colors = StretchedGradient(self.get(key[0], GRADIENT_STEPS), length)
+        else:
+            colors = gradient_colors(key[0], length, self.base_hsv(key[0]))
+        self.gradients[key] = colors
+        if len(self.gradients) > self.maxsize:
+            self.gradients.popitem(last=False)
+        return colors
+
+    def base_hsv(self, base_color):
+        hsv = self.hsv.get(base_color)
+        if hsv is None:
+            if len(self.hsv) >= self.maxsize:
+                self.hsv.clear()
+            r, g, b = base_color
+            hsv = self.hsv[base_color] = colorsys.rgb_to_hsv(r/255, g/255, b/255)
+        return hsv
+
+    def prime_transition(self, from_color, to_color, length):
+        # Precompute both frames of a board switch transition
+        self.get(blend_color(from_color, to_color), length)
+        self.get(to_color, length)
+
+    def clear(self):
+        self.gradients.clear()
+        self.hsv.clear()
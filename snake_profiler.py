@@ -0,0 +1,110 @@
+import csv
+import json
+import time
+from array import array
+
+# Per-phase frame profiler for SnakeGame.run().
+#
+# Each frame records how long every phase of the loop took into fixed-size
+# ring buffers, so memory stays flat however long the game runs. When the
+# profiler is disabled the loop skips every call into it, so the only cost is
+# one attribute check per frame.
+
+PHASES = ('wait', 'update', 'input', 'draw', 'flip')
+HISTORY_SIZE = 600  # frames kept, 10 seconds at 60 fps
+PERCENTILES = (50, 95, 99)
+
+
+class FrameProfiler:
+    def __init__(self, size=HISTORY_SIZE, enabled=False):
+        self.size = size
+        self.enabled = enabled
+        self.samples = {phase: array('d', bytes(8 * size)) for phase in PHASES}
+        self.totals = array('d', bytes(8 * size))
+        self.index = 0
+        self.count = 0
+        self.frames = 0
+        self.current = {}
+        self.last_mark = 0.0
+        self.subscribers = []
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        return self.enabled
+
+    def subscribe(self, callback):
+        # callback(frame_number, {phase: seconds}) runs after every profiled
+        # frame; returns a function that removes the subscription
+        self.subscribers.append(callback)
+        return lambda: self.subscribers.remove(callback)
+
+    def begin_frame(self):
+        self.current = {}
+        self.last_mark = time.perf_counter()
+
+    def mark(self, phase):
+        # Ends `phase`: it lasted from the previous mark until now
+        now = time.perf_counter()
+        self.current[phase] = self.current.get(phase, 0.0) + now - self.last_mark
+        self.last_mark = now
+
+    def end_frame(self, phase=None):
+        if phase is not None:
+            self.mark(phase)
+        sample = self.current
+        idx = self.index
+        total = 0.0
+        for name in PHASES:
+            value = sample.get(name, 0.0)
+            self.samples[name][idx] = value
+            total += value
+        self.totals[idx] = total
+        self.index = (idx + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+        self.frames += 1
+        for callback in self.subscribers:
+            callback(self.frames, sample)
+
+    def history(self, phase=None):
+        # Recorded values for a phase (or frame totals), oldest first
+        values = self.totals if phase is None else self.samples[phase]
+        if self.count < self.size:
+            return values[:self.count].tolist()
+        return (values[self.index:] + values[:self.index]).tolist()
+
+    def stats(self, phase=None):
+        # p50/p95/p99/max in seconds over the recorded frames
+        values = sorted(self.history(phase)) or [0.0]
+        result = {}
+        for p in PERCENTILES:
+            result[f'p{p}'] = values[min(len(values) - 1, len(values) * p // 100)]
+        result['max'] = values[-1]
+        return result
+
+    def summary(self):
+        summary = {phase: self.stats(phase) for phase in PHASES}
+        summary['total'] = self.stats()
+        return summary
+
+    def hud_text(self):
+        # One-line p95 summary for the info bar, in milliseconds
+        parts = [f'{phase} {self.stats(phase)["p95"] * 1000:.1f}' for phase in ('input', 'update', 'draw', 'flip')]
+        return 'p95 ms: ' + '  '.join(parts)
+
+    def dump(self, path):
+        # Writes the recorded frames as CSV, or as JSON with a summary when
+        # the path ends in .json
+        columns = {phase: self.history(phase) for phase in PHASES}
+        columns['total'] = self.history()
+        first_frame = self.frames - self.count + 1
+        if path.endswith('.json'):
+            rows = [dict(frame=first_frame + i, **{name: values[i] for name, values in columns.items()})
+                    for i in range(self.count)]
+            with open(path, 'w') as f:
+                json.dump({'summary': self.summary(), 'frames': rows}, f, indent=1)
+            return
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['frame', *columns])
+            for i in range(self.count):
+                writer.writerow([first_frame + i, *(values[i] for values in columns.values())])
@@ -0,0 +1,134 @@
+import json
+import os
+import sys
+
+import pygame
+
+# Render caches for SnakeGame.
+#
+# Font rendering and full-screen overlay allocation dominate the cost of the
+# info bar and the color menus, yet almost everything they draw is static.
+# These caches hand back the same surfaces until their inputs change.
+#
+# Fonts are found through a small cache on disk: pygame.font.SysFont()
+# lists every installed font on each launch (hundreds of milliseconds on
+# some systems), while the file it settles on rarely changes. A font that is
+# not installed is remembered too, until something under the font
+# directories changes.
+
+FONT_CACHE_FILE = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'),
+                               'multiboard-snake', 'fonts.json')
+# Where fonts get installed; a change under any of them voids cached misses
+if sys.platform == 'win32':
+    FONT_DIRS = [os.path.join(os.environ.get('WINDIR', r'C:\Windows'), 'Fonts'),
+                 os.path.expanduser(r'~\AppData\Local\Microsoft\Windows\Fonts')]
+elif sys.platform == 'darwin':
+    FONT_DIRS = ['/System/Library/Fonts', '/Library/Fonts', os.path.expanduser('~/Library/Fonts')]
+else:
+    FONT_DIRS = ['/usr/share/fonts', '/usr/local/share/fonts', os.path.expanduser('~/.fonts'),
+                 os.path.join(os.environ.get('XDG_DATA_HOME') or os.path.expanduser('~/.local/share'), 'fonts')]
+font_paths = {}  # name -> file, or '' for a font that is not installed
+
+
+def font_dirs_stamp():
+    # Newest mtime of the font directories and their subdirectories:
+    # installing or removing a font changes the one it lands in
+    stamp = 0.0
+    for top in FONT_DIRS:
+        for root, _, _ in os.walk(top):
+            try:
+                stamp = max(stamp, os.stat(root).st_mtime)
+            except OSError:
+                pass
+    return stamp
+
+
+def font_path(name, cache_file=FONT_CACHE_FILE):
+    # The file SysFont(name) would use, resolved once and remembered on
+    # disk; '' (pygame's default font) when it is not installed. A miss is
+    # remembered with the font directories' stamp and looked up again once
+    # that changes, so a font installed later is picked up.
+    path = font_paths.get(name)
+    if path is not None:
+        return path
+    try:
+        with open(cache_file) as f:
+            cache = json.load(f)
+        found, missing = dict(cache['found']), dict(cache['missing'])
+    except (OSError, ValueError, KeyError, TypeError):
+        found, missing = {}, {}
+    path = found.get(name)
+    if path and os.path.exists(path):
+        font_paths[name] = path
+        return path
+    stamp = font_dirs_stamp()
+    if not path and missing.get(name) == stamp:
+        font_paths[name] = ''
+        return ''
+    path = font_paths[name] = pygame.font.match_font(name) or ''
+    found.pop(name, None)
+    missing.pop(name, None)
+    if path:
+        found[name] = path
+    else:
+        missing[name] = stamp
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        with open(cache_file, 'w') as f:
+            json.dump({'found': found, 'missing': missing}, f)
+    except OSError:
+        pass
+    return path
+
+
+def load_font(name, size):
+    # Same font as pygame.font.SysFont(name, size), without the font scan
+    return pygame.font.Font(font_path(name) or None, size)
+
+
+class TextCache:
+    def __init__(self, font):
+        self.font = font
+        self.static = {}
+        self.slots = {}
+
+    def render(self, text, color):
+        # Fixed strings: rendered once and kept for the life of the cache
+        key = (text, color)
+        surface = self.static.get(key)
+        if surface is None:
+            surface = self.static[key] = self.font.render(text, True, color)
+        return surface
+
+    def slot(self, name, text, color):
+        # Changing strings (score, board...): each slot keeps only its latest
+        # value and re-renders when that value changes
+        entry = self.slots.get(name)
+        if entry is None or entry[0] != (text, color):
+            entry = self.slots[name] = ((text, color), self.font.render(text, True, color))
+        return entry[1]
+
+
+class SurfaceCache:
+    def __init__(self):
+        self.surfaces = {}
+
+    def get(self, name, key, build):
+        # Returns the surface built for `key`, calling build() when the key
+        # for this name has changed since the last request
+        entry = self.surfaces.get(name)
+        if entry is None or entry[0] != key:
+            entry = self.surfaces[name] = (key, build())
+        return entry[1]
+
+    def backdrop(self, size, color, alpha):
+        # Translucent full-screen overlay fill
+        def build():
+            overlay = pygame.Surface(size)
+            overlay.set_alpha(alpha)
+            overlay.fill(color)
+            return overlay
+        return self.get(('backdrop', color, alpha), size, build)
+
+    def clear(self):
+        self.surfaces.clear()
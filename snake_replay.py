@@ -0,0 +1,317 @@
+import argparse
+import itertools
+import mmap
+import random
+import struct
+import sys
+from collections import namedtuple
+
+from snake_engine import BOARD_COUNT, BOARD_SIZE, DOWN, LEFT, RIGHT, UP, SnakeEngine
+
+# Deterministic replays.
+#
+# A replay is the engine's RNG seed plus the inputs the engine accepted, each
+# stamped with the tick it was applied on. Re-running those inputs through a
+# SnakeEngine with the same seed reproduces the game exactly.
+#
+# File layout (little endian):
+#   header  'SNKR', version u8, seed u64, board width u16, board height u16,
+#           board count u8
+#   events  one byte each: low 3 bits event code, high 5 bits ticks since the
+#           previous event. A delta of 31 or more stores 31 and is followed by
+#           the remainder as an unsigned LEB128 varint.
+#   END     closes the recording; its delta runs to the last recorded tick.
+#           A file that stops without END (the recorder was killed) reads
+#           as a truncated recording ending at its last complete event.
+# Recordings can be concatenated into one archive file. Readers decode the
+# file from a memory map (or any stream) a chunk at a time, so archive size
+# does not affect memory use.
+
+MAGIC = b'SNKR'
+VERSION = 1
+HEADER = struct.Struct('<4sBQHHB')
+SEED_RANGE = 1 << 64  # header seeds are u64
+MAX_BOARD_SIDE = 0xFFFF
+MAX_BOARDS = 0xFF
+CHUNK_SIZE = 1 << 20
+
+EV_UP, EV_DOWN, EV_LEFT, EV_RIGHT, EV_BOARD_UP, EV_BOARD_DOWN, EV_RESTART, EV_END = range(8)
+EV_TRUNCATED = 8  # never stored; the reader's END for a recording cut off early
+DIRECTION_EVENTS = {UP: EV_UP, DOWN: EV_DOWN, LEFT: EV_LEFT, RIGHT: EV_RIGHT}
+EVENT_DIRECTIONS = {code: direction for direction, code in DIRECTION_EVENTS.items()}
+DELTA_ESCAPE = 31
+
+Replay = namedtuple('Replay', 'seed board_size board_count events')
+GameResult = namedtuple('GameResult', 'game score length death_tick won ticks truncated')
+
+
+class ReplayError(Exception):
+    pass
+
+
+def check_settings(board_size, board_count):
+    # Raises ValueError for games the replay header cannot describe
+    width, height = board_size
+    if not (0 < width <= MAX_BOARD_SIDE and 0 < height <= MAX_BOARD_SIDE):
+        raise ValueError(f'replays support boards of 1 to {MAX_BOARD_SIDE} cells a side, not {width}x{height}')
+    if not 0 < board_count <= MAX_BOARDS:
+        raise ValueError(f'replays support 1 to {MAX_BOARDS} boards, not {board_count}')
+
+
+def new_seed():
+    # Seed for a recorded game when the caller did not pick one
+    return random.SystemRandom().getrandbits(63)
+
+
+class ReplayRecorder:
+    # Drives a SnakeEngine and logs each input it accepts. Use it in place of
+    # the engine for queue_direction / switch_board / reset / update.
+    def __init__(self, stream, engine, seed):
+        self.stream = stream
+        self.engine = engine
+        self.tick = 0
+        self.last_event_tick = 0
+        self.unflushed = False
+        if not 0 <= seed < SEED_RANGE:
+            raise ValueError(f'replay seeds must be in 0..2**64-1, not {seed}')
+        check_settings(engine.board_size, engine.board_count)
+        stream.write(HEADER.pack(MAGIC, VERSION, seed, engine.board_size[0],
+                                 engine.board_size[1], engine.board_count))
+
+    @classmethod
+    def open(cls, path, seed=None, board_size=BOARD_SIZE, board_count=BOARD_COUNT):
+        # Creates a fresh engine and starts recording it to `path`
+        # Checked before the file is opened, so a bad setting leaves any
+        # existing recording alone
+        check_settings(board_size, board_count)
+        if seed is None:
+            seed = new_seed()
+        # Other seeds are folded into the header's range; the engine uses the
+        # folded seed too, so the recording still reproduces the game
+        seed %= SEED_RANGE
+        engine = SnakeEngine(seed, board_size, board_count)
+        return cls(open(path, 'wb'), engine, seed)
+
+    def record(self, code):
+        delta = self.tick - self.last_event_tick
+        self.last_event_tick = self.tick
+        self.unflushed = True
+        if delta < DELTA_ESCAPE:
+            self.stream.write(bytes(((delta << 3) | code,)))
+            return
+        out = bytearray(((DELTA_ESCAPE << 3) | code,))
+        delta -= DELTA_ESCAPE
+        while delta >= 0x80:
+            out.append((delta & 0x7f) | 0x80)
+            delta >>= 7
+        out.append(delta)
+        self.stream.write(out)
+
+    def queue_direction(self, direction):
+        accepted = self.engine.queue_direction(direction)
+        if accepted:
+            self.record(DIRECTION_EVENTS[direction])
+        return accepted
+
+    def switch_board(self, delta):
+        switched = self.engine.switch_board(delta)
+        if switched:
+            self.record(EV_BOARD_UP if delta < 0 else EV_BOARD_DOWN)
+        return switched
+
+    def reset(self):
+        self.engine.reset()
+        self.record(EV_RESTART)
+
+    def update(self):
+        self.engine.update()
+        self.tick += 1
+        # Inputs reach the file within a tick, so a killed session loses at
+        # most the time since the last one
+        if self.unflushed:
+            self.stream.flush()
+            self.unflushed = False
+
+    def close(self):
+        if self.stream is not None:
+            self.record(EV_END)
+            self.stream.close()
+            self.stream = None
+
+
+def iter_chunks(source):
+    # Yields the bytes of a path or binary file object, memory-mapping
+    # regular files and reading anything else (pipes, sockets) in chunks
+    if isinstance(source, (str, bytes)) or hasattr(source, '__fspath__'):
+        with open(source, 'rb') as f:
+            yield from iter_chunks(f)
+        return
+    try:
+        mapped = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+    except (AttributeError, OSError, ValueError):
+        # Not mappable (or empty): stream it
+        while True:
+            chunk = source.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+    else:
+        with mapped:
+            for offset in range(0, len(mapped), CHUNK_SIZE):
+                yield mapped[offset:offset + CHUNK_SIZE]
+
+
+def read_replays(source):
+    # Yields every recording in a replay file or archive. Each Replay's
+    # events iterator must be consumed (or abandoned) before moving on.
+    data = itertools.chain.from_iterable(iter_chunks(source))
+    while True:
+        header = bytes(itertools.islice(data, HEADER.size))
+        if not header:
+            return
+        if len(header) < HEADER.size:
+            raise ReplayError('truncated replay header')
+        magic, version, seed, width, height, boards = HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            raise ReplayError('not a snake replay (or unsupported version)')
+        replay = Replay(seed, (width, height), boards, iter_events(data))
+        yield replay
+        # Skip whatever the caller left unread of this recording
+        for _ in replay.events:
+            pass
+
+
+def iter_events(data):
+    # Decodes (tick, code) pairs up to and including the END event, or up to
+    # EV_TRUNCATED when the data runs out first
+    tick = 0
+    for byte in data:
+        code = byte & 7
+        delta = byte >> 3
+        if delta == DELTA_ESCAPE:
+            shift = 0
+            for part in data:
+                delta += (part & 0x7f) << shift
+                if part < 0x80:
+                    break
+                shift += 7
+            else:
+                # Cut off inside the event: drop it
+                break
+        tick += delta
+        yield tick, code
+        if code == EV_END:
+            return
+    yield tick, EV_TRUNCATED
+
+
+class ReplayPlayer:
+    # Feeds a recording back one tick at a time. `target` receives the inputs
+    # and must offer queue_direction / switch_board / reset / update; by
+    # default it is a fresh engine, SnakeGame passes itself to render.
+    def __init__(self, replay, target=None):
+        self.engine = SnakeEngine(replay.seed, replay.board_size, replay.board_count)
+        self.target = target if target is not None else self.engine
+        self.events = replay.events
+        self.pending = next(self.events)
+        self.tick = 0
+        self.finished = False
+
+    def apply(self, code):
+        if code in EVENT_DIRECTIONS:
+            self.target.queue_direction(EVENT_DIRECTIONS[code])
+        elif code == EV_BOARD_UP:
+            self.target.switch_board(-1)
+        elif code == EV_BOARD_DOWN:
+            self.target.switch_board(1)
+        elif code == EV_RESTART:
+            self.target.reset()
+
+    def apply_pending(self):
+        # Applies the inputs recorded for the current tick; True at END
+        while self.pending[0] == self.tick:
+            if self.pending[1] in (EV_END, EV_TRUNCATED):
+                self.finished = True
+                return True
+            self.apply(self.pending[1])
+            self.pending = next(self.events)
+        return False
+
+    def advance(self):
+        # Plays one tick; returns False once the recording is over
+        if self.finished or self.apply_pending():
+            return False
+        self.target.update()
+        self.tick += 1
+        return True
+
+    def results(self):
+        # Plays the rest of the recording headless, as fast as possible, and
+        # yields a GameResult for each game (each restart begins a new one)
+        engine = self.engine
+        game = 0
+        game_start = self.tick
+        death_tick = None
+        while not self.finished:
+            tick, code = self.pending
+            while self.tick < tick:
+                if engine.game_over:
+                    # Nothing changes until the next input: jump straight to it
+                    self.tick = tick
+                    break
+                engine.update()
+                self.tick += 1
+                if engine.game_over:
+                    death_tick = self.tick
+            if code in (EV_RESTART, EV_END, EV_TRUNCATED):
+                end = death_tick if death_tick is not None else self.tick
+                yield GameResult(game, engine.score, len(engine.snake), death_tick,
+                                 engine.won, end - game_start, code == EV_TRUNCATED)
+                game += 1
+                game_start = self.tick
+                death_tick = None
+            if code in (EV_END, EV_TRUNCATED):
+                self.finished = True
+                return
+            self.apply(code)
+            self.pending = next(self.events)
+
+
+def check(source):
+    # Summarises every game in a replay file or archive without loading it
+    for index, replay in enumerate(read_replays(source)):
+        for result in ReplayPlayer(replay).results():
+            yield index, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check or play back snake replays')
+    sub = parser.add_subparsers(dest='command', required=True)
+    check_cmd = sub.add_parser('check', help='replay headless and print each game result')
+    check_cmd.add_argument('replay', help="replay file or archive, '-' for stdin")
+    play_cmd = sub.add_parser('play', help='replay in a window')
+    play_cmd.add_argument('replay')
+    play_cmd.add_argument('--speed', type=float, default=1.0, help='playback speed multiplier')
+    args = parser.parse_args(argv)
+    try:
+        if args.command == 'check':
+            source = sys.stdin.buffer if args.replay == '-' else args.replay
+            for index, result in check(source):
+                death = result.death_tick if result.death_tick is not None else '-'
+                print(f'recording {index} game {result.game}: score {result.score} '
+                      f'length {result.length} death tick {death}'
+                      f'{" (won)" if result.won else ""}'
+                      f'{" (recording truncated)" if result.truncated else ""}')
+        else:
+            from snake_game import SnakeGame
+            for replay in read_replays(args.replay):
+                SnakeGame.play_replay(replay, args.speed)
+                break
+    except ReplayError as error:
+        print(f'{args.replay}: {error}', file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,482 @@
+import argparse
+import asyncio
+import json
+import random
+import struct
+import sys
+import time
+from collections import deque
+
+from snake_engine import (BOARD_COUNT, BOARD_SIZE, DIRECTIONS, INPUT_QUEUE_SIZE, START_LENGTH, TICK_RATE,
+                          OccupancyGrid)
+from snake_replay import EV_BOARD_DOWN, EV_BOARD_UP, EV_RESTART, EVENT_DIRECTIONS
+
+# Authoritative multiplayer server.
+#
+# Each room is one shared game: every player has a snake, the apple and the
+# boards are shared, and eating still only counts on the apple's board.
+# Bodies collide whatever board their owners are on, just as a single
+# player's body stays put when they switch boards. Two heads entering the
+# same cell both die. Dead players respawn when they press R.
+#
+# One asyncio task ticks every room. Inputs are queued as they arrive and
+# applied at the start of the next tick, so all state changes happen inside
+# Room.step(). Each tick is sent as a list of small binary deltas (head
+# added, tail removed, apple moved...), encoded once per room and written
+# unchanged to every client. A new player gets a full JSON snapshot after
+# the tick they join on, and deltas from the next one.
+#
+# Frames in both directions are a u32 length followed by the payload; the
+# first payload byte is the message type. Clients send MSG_JOIN with a room
+# name, then MSG_INPUT with replay event codes (turns, W/S, R).
+#
+# Room.step() does not touch sockets: players are given a send(frame)
+# callable, so rooms can be driven by in-memory fake clients, as
+# test_snake_server.py does. `python snake_server.py bench` uses them to
+# measure how many rooms one process can tick.
+
+FRAME = struct.Struct('>I')
+MAX_CLIENT_FRAME = 1024  # longest frame accepted from a client
+MAX_SEND_BUFFER = 1 << 18  # bytes queued to a client before it is dropped
+MAX_QUEUED_INPUTS = 2 * INPUT_QUEUE_SIZE
+
+MSG_JOIN, MSG_INPUT = 1, 2  # client to server
+MSG_WELCOME, MSG_TICK = 1, 2  # server to client
+
+# Tick deltas: code u8, then the fields below, big endian
+D_HEAD, D_TAIL, D_APPLE, D_BOARD, D_SCORE, D_DIE, D_SPAWN, D_LEAVE = range(8)
+DELTAS = {
+    D_HEAD: struct.Struct('>BHHH'),  # player, x, y
+    D_TAIL: struct.Struct('>BH'),  # player
+    D_APPLE: struct.Struct('>BBHH'),  # board, x, y (NO_CELL when none)
+    D_BOARD: struct.Struct('>BHB'),  # player, board
+    D_SCORE: struct.Struct('>BHI'),  # player, score
+    D_DIE: struct.Struct('>BHB'),  # player, index into DEATH_CAUSES
+    D_SPAWN: struct.Struct('>BHHHB'),  # player, x, y, board
+    D_LEAVE: struct.Struct('>BH'),  # player
+}
+TICK_HEADER = struct.Struct('>BIH')  # MSG_TICK, tick, delta count
+NO_CELL = 0xFFFF
+DEATH_CAUSES = ('wall', 'self', 'snake', 'head')
+
+
+def frame(payload):
+    return FRAME.pack(len(payload)) + payload
+
+
+async def read_frame(reader, limit=None):
+    # Next payload from a stream, or None at end of stream
+    try:
+        size, = FRAME.unpack(await reader.readexactly(FRAME.size))
+        if limit is not None and size > limit:
+            return None
+        return await reader.readexactly(size)
+    except asyncio.IncompleteReadError:
+        return None
+
+
+def encode_tick(tick, deltas):
+    parts = [TICK_HEADER.pack(MSG_TICK, tick, len(deltas))]
+    parts.extend(DELTAS[delta[0]].pack(*delta) for delta in deltas)
+    return frame(b''.join(parts))
+
+
+class Player:
+    def __init__(self, pid, send, board):
+        self.id = pid
+        self.send = send
+        self.snake = deque()
+        self.direction = DIRECTIONS[0]
+        self.inputs = deque()
+        self.length = START_LENGTH
+        self.score = 0
+        self.board = board
+        self.alive = False
+        self.welcomed = False
+
+
+class Room:
+    def __init__(self, name='', seed=None, board_size=BOARD_SIZE, board_count=BOARD_COUNT):
+        self.name = name
+        self.board_size = board_size
+        self.board_count = board_count
+        self.rng = random.Random(seed)
+        # All bodies share one grid; each cell maps to its snake's player id
+        self.grid = OccupancyGrid(*board_size)
+        self.players = {}
+        self.joining = []
+        self.leaving = []
+        self.next_id = 0
+        self.tick = 0
+        self.apple_board = 0
+        self.apple_pos = None
+        self.place_apple([])
+
+    def __len__(self):
+        return len(self.players) + len(self.joining)
+
+    def join(self, send):
+        # Adds a player on the next tick; send(frame) receives their frames.
+        # Ids are u16 and wrap around, skipping those still in the room.
+        if len(self) >= NO_CELL:
+            raise ValueError(f'room {self.name!r} is full')
+        taken = {player.id for player in self.joining}
+        pid = self.next_id
+        while pid in self.players or pid in taken:
+            pid = (pid + 1) % NO_CELL
+        self.next_id = (pid + 1) % NO_CELL
+        player = Player(pid, send, min(1, self.board_count - 1))
+        self.joining.append(player)
+        return player
+
+    def leave(self, player):
+        if player in self.joining:
+            self.joining.remove(player)
+        elif player.id in self.players:
+            self.leaving.append(player)
+
+    def queue_input(self, player, code):
+        # Replay event codes; applied from the next tick
+        if len(player.inputs) < MAX_QUEUED_INPUTS:
+            player.inputs.append(code)
+
+    def place_apple(self, deltas):
+        self.apple_board = self.rng.randrange(self.board_count)
+        self.apple_pos = self.grid.sample_free(self.rng)
+        x, y = self.apple_pos if self.apple_pos is not None else (NO_CELL, NO_CELL)
+        deltas.append((D_APPLE, self.apple_board, x, y))
+
+    def spawn(self, player, deltas):
+        cell = self.grid.sample_free(self.rng)
+        if cell is None:
+            return
+        width, height = self.board_size
+        x, y = cell
+        # Head for the far side of the board
+        room = {DIRECTIONS[0]: y, DIRECTIONS[1]: height - 1 - y, DIRECTIONS[2]: x, DIRECTIONS[3]: width - 1 - x}
+        player.direction = max(DIRECTIONS, key=room.get)
+        player.snake = deque([cell])
+        player.length = START_LENGTH
+        player.alive = True
+        player.inputs.clear()
+        self.grid.add(cell, player.id)
+        deltas.append((D_SPAWN, player.id, x, y, player.board))
+        if self.apple_pos is None:
+            self.place_apple(deltas)
+
+    def kill(self, player, cause, deltas):
+        for cell in player.snake:
+            self.grid.remove(cell)
+        player.snake.clear()
+        player.alive = False
+        deltas.append((D_DIE, player.id, DEATH_CAUSES.index(cause)))
+
+    def apply_inputs(self, player, deltas):
+        # Board switches apply at once; at most one turn per tick
+        inputs = player.inputs
+        while inputs:
+            code = inputs.popleft()
+            if code in EVENT_DIRECTIONS:
+                direction = EVENT_DIRECTIONS[code]
+                if player.alive and direction != (-player.direction[0], -player.direction[1]):
+                    player.direction = direction
+                    return
+            elif code == EV_BOARD_UP or code == EV_BOARD_DOWN:
+                board = player.board + (-1 if code == EV_BOARD_UP else 1)
+                if 0 <= board < self.board_count:
+                    player.board = board
+                    deltas.append((D_BOARD, player.id, board))
+            elif code == EV_RESTART and not player.alive:
+                self.spawn(player, deltas)
+                return
+
+    def step(self):
+        # Advances the room one tick and sends the tick's deltas
+        deltas = []
+        grid = self.grid
+        for player in self.leaving:
+            if player.alive:
+                self.kill(player, 'snake', [])
+            del self.players[player.id]
+            deltas.append((D_LEAVE, player.id))
+        self.leaving.clear()
+        joined = self.joining
+        self.joining = []
+        for player in joined:
+            self.players[player.id] = player
+            self.spawn(player, deltas)
+        heads = {}
+        for player in self.players.values():
+            self.apply_inputs(player, deltas)
+            if player.alive:
+                x, y = player.snake[0]
+                heads[player] = (x + player.direction[0], y + player.direction[1])
+        # Collisions are checked before any tail moves, as in SnakeEngine
+        width, height = self.board_size
+        targets = {}
+        for head in heads.values():
+            targets[head] = targets.get(head, 0) + 1
+        dead = []
+        for player, head in heads.items():
+            if not (0 <= head[0] < width and 0 <= head[1] < height):
+                dead.append((player, 'wall'))
+            elif head in grid:
+                dead.append((player, 'self' if grid.get(head) == player.id else 'snake'))
+            elif targets[head] > 1:
+                dead.append((player, 'head'))
+        for player, cause in dead:
+            del heads[player]
+            self.kill(player, cause, deltas)
+        eaten = False
+        for player, head in heads.items():
+            player.snake.appendleft(head)
+            grid.add(head, player.id)
+            deltas.append((D_HEAD, player.id, head[0], head[1]))
+            if player.board == self.apple_board and head == self.apple_pos:
+                player.length += 1
+                player.score += 1
+                deltas.append((D_SCORE, player.id, player.score))
+                eaten = True
+            if len(player.snake) > player.length:
+                grid.remove(player.snake.pop())
+                deltas.append((D_TAIL, player.id))
+        if eaten or (self.apple_pos is None and len(grid) < grid.size):
+            self.place_apple(deltas)
+        self.tick += 1
+        data = encode_tick(self.tick, deltas)
+        for player in self.players.values():
+            if player.welcomed:
+                player.send(data)
+        for player in joined:
+            player.send(self.welcome(player))
+            player.welcomed = True
+        return deltas
+
+    def snapshot(self):
+        return {
+            'tick': self.tick,
+            'board_size': list(self.board_size),
+            'board_count': self.board_count,
+            'apple': [self.apple_board, *self.apple_pos] if self.apple_pos is not None else None,
+            'players': [{'id': p.id, 'board': p.board, 'score': p.score, 'alive': p.alive,
+                         'snake': [list(cell) for cell in p.snake]} for p in self.players.values()],
+        }
+
+    def welcome(self, player):
+        state = self.snapshot()
+        state['you'] = player.id
+        return frame(bytes([MSG_WELCOME]) + json.dumps(state, separators=(',', ':')).encode())
+
+
+class ClientState:
+    # A client's copy of a room, kept up to date from the server's frames
+    def __init__(self):
+        self.you = None
+        self.tick = 0
+        self.board_size = BOARD_SIZE
+        self.board_count = BOARD_COUNT
+        self.apple_board = 0
+        self.apple_pos = None
+        self.snakes = {}
+        self.boards = {}
+        self.scores = {}
+
+    def apply(self, payload):
+        if payload[0] == MSG_WELCOME:
+            state = json.loads(payload[1:])
+            self.you = state['you']
+            self.tick = state['tick']
+            self.board_size = tuple(state['board_size'])
+            self.board_count = state['board_count']
+            apple = state['apple']
+            self.apple_board, self.apple_pos = (apple[0], tuple(apple[1:])) if apple else (0, None)
+            self.snakes = {p['id']: deque(map(tuple, p['snake'])) for p in state['players']}
+            self.boards = {p['id']: p['board'] for p in state['players']}
+            self.scores = {p['id']: p['score'] for p in state['players']}
+            return
+        _, self.tick, count = TICK_HEADER.unpack_from(payload)
+        pos = TICK_HEADER.size
+        snakes = self.snakes
+        for _ in range(count):
+            delta = DELTAS[payload[pos]]
+            code, *fields = delta.unpack_from(payload, pos)
+            pos += delta.size
+            if code == D_HEAD:
+                snakes[fields[0]].appendleft((fields[1], fields[2]))
+            elif code == D_TAIL:
+                snakes[fields[0]].pop()
+            elif code == D_APPLE:
+                board, x, y = fields
+                self.apple_board = board
+                self.apple_pos = (x, y) if x != NO_CELL else None
+            elif code == D_BOARD:
+                self.boards[fields[0]] = fields[1]
+            elif code == D_SCORE:
+                self.scores[fields[0]] = fields[1]
+            elif code == D_DIE:
+                snakes[fields[0]].clear()
+            elif code == D_SPAWN:
+                pid, x, y, board = fields
+                snakes[pid] = deque([(x, y)])
+                self.boards[pid] = board
+                self.scores.setdefault(pid, 0)
+            elif code == D_LEAVE:
+                for table in (snakes, self.boards, self.scores):
+                    table.pop(fields[0], None)
+
+    def matches(self, room):
+        # True when this copy agrees with the room (for tests and benchmarks)
+        return (self.tick == room.tick and self.apple_pos == room.apple_pos
+                and self.apple_board == room.apple_board
+                and self.snakes == {p.id: p.snake for p in room.players.values()}
+                and self.boards == {p.id: p.board for p in room.players.values()}
+                and self.scores == {p.id: p.score for p in room.players.values()})
+
+
+class SnakeServer:
+    def __init__(self, tick_rate=TICK_RATE, seed=None, board_size=BOARD_SIZE, board_count=BOARD_COUNT):
+        self.tick_rate = tick_rate
+        self.rng = random.Random(seed)
+        self.board_size = board_size
+        self.board_count = board_count
+        self.rooms = {}
+        self.tick_time = 0.0  # seconds the last tick of every room took
+
+    def room(self, name):
+        room = self.rooms.get(name)
+        if room is None:
+            room = self.rooms[name] = Room(name, self.rng.getrandbits(64), self.board_size, self.board_count)
+        return room
+
+    def step(self):
+        start = time.perf_counter()
+        for name, room in list(self.rooms.items()):
+            room.step()
+            if not room:
+                del self.rooms[name]
+        self.tick_time = time.perf_counter() - start
+
+    async def run(self):
+        # Ticks every room at tick_rate; a late tick shortens the next wait
+        loop = asyncio.get_running_loop()
+        interval = 1.0 / self.tick_rate
+        deadline = loop.time()
+        while True:
+            self.step()
+            deadline += interval
+            delay = deadline - loop.time()
+            if delay < -interval:
+                # Too far behind to catch up; skip the missed ticks
+                deadline = loop.time()
+                delay = 0
+            await asyncio.sleep(max(0.0, delay))
+
+    async def handle_client(self, reader, writer):
+        room = player = None
+        try:
+            message = await read_frame(reader, MAX_CLIENT_FRAME)
+            if not message or message[0] != MSG_JOIN:
+                return
+            room = self.room(message[1:].decode(errors='replace'))
+            player = room.join(lambda data: self.send(writer, data))
+            while True:
+                message = await read_frame(reader, MAX_CLIENT_FRAME)
+                if message is None:
+                    break
+                if message[0] == MSG_INPUT:
+                    for code in message[1:]:
+                        room.queue_input(player, code)
+        except ConnectionError:
+            pass
+        finally:
+            if player is not None:
+                room.leave(player)
+            writer.close()
+
+    @staticmethod
+    def send(writer, data):
+        transport = writer.transport
+        if transport.is_closing():
+            return
+        if transport.get_write_buffer_size() > MAX_SEND_BUFFER:
+            # Too slow to keep up; the reader loop sees the close and leaves
+            transport.abort()
+            return
+        writer.write(data)
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle_client, host, port)
+        async with server:
+            await asyncio.gather(server.serve_forever(), self.run())
+
+
+class FakeClient:
+    # In-memory client: collects its frames and keeps a ClientState
+    def __init__(self, room):
+        self.room = room
+        self.state = ClientState()
+        self.player = room.join(self.receive)
+        self.frames = 0
+        self.rng = random.Random(self.player.id)
+
+    def receive(self, data):
+        self.state.apply(data[FRAME.size:])
+        self.frames += 1
+
+    def press(self, code):
+        self.room.queue_input(self.player, code)
+
+    def play(self):
+        # Random turns and board switches, restarting after each death
+        roll = self.rng.random()
+        if not self.player.alive:
+            self.press(EV_RESTART)
+        elif roll < 0.15:
+            self.press(self.rng.choice(tuple(EVENT_DIRECTIONS)))
+        elif roll < 0.2:
+            self.press(self.rng.choice((EV_BOARD_UP, EV_BOARD_DOWN)))
+
+
+def bench(rooms=300, players=4, ticks=200, seed=0):
+    # Ticks `rooms` rooms of fake clients; returns (mean ms per server
+    # tick, whether every client's state matched its room)
+    server = SnakeServer(seed=seed)
+    clients = [FakeClient(server.room(f'room{i}')) for i in range(rooms) for _ in range(players)]
+    elapsed = 0.0
+    for _ in range(ticks):
+        for client in clients:
+            client.play()
+        server.step()
+        elapsed += server.tick_time
+    in_sync = all(client.state.matches(client.room) for client in clients)
+    return elapsed / ticks * 1000, in_sync
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Multi-Board Snake multiplayer server')
+    sub = parser.add_subparsers(dest='command', required=True)
+    serve_cmd = sub.add_parser('serve', help='run the server')
+    serve_cmd.add_argument('--host', default='0.0.0.0')
+    serve_cmd.add_argument('--port', type=int, default=7777)
+    serve_cmd.add_argument('--tick-rate', type=int, default=TICK_RATE)
+    serve_cmd.add_argument('--seed', type=int)
+    bench_cmd = sub.add_parser('bench', help='tick rooms of in-memory fake clients')
+    bench_cmd.add_argument('--rooms', type=int, default=300)
+    bench_cmd.add_argument('--players', type=int, default=4, help='players per room')
+    bench_cmd.add_argument('--ticks', type=int, default=200)
+    args = parser.parse_args(argv)
+    if args.command == 'serve':
+        server = SnakeServer(args.tick_rate, args.seed)
+        try:
+            asyncio.run(server.serve(args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+        return 0
+    ms, in_sync = bench(args.rooms, args.players, args.ticks)
+    print(f'{args.rooms} rooms x {args.players} players: {ms:.2f} ms per tick '
+          f'({ms * TICK_RATE / 10:.1f}% of one core at {TICK_RATE} Hz), clients in sync: {in_sync}')
+    return 0 if in_sync else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
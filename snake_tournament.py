@@ -0,0 +1,225 @@
+import argparse
+import csv
+import gzip
+import io
+import json
+import multiprocessing
+import random
+import signal
+import sys
+import time
+
+from snake_engine import BOARD_COUNT, BOARD_SIZE, DIRECTIONS, SnakeEngine, simulate
+
+# Self-play tournaments: many seeded headless games across a process pool.
+#
+#   python snake_tournament.py --games 100000 --agent autopilot -o results.csv.gz
+#
+# Seeds are split into shards of --shard-size games. Each worker process
+# plays a whole shard and returns it as a finished gzip member, and the parent
+# appends the members to the output as shards complete, so memory stays flat
+# however many games are played. The output reads as one gzip'd CSV file.
+# Workers also count every finished game in shared memory, so progress and
+# games/sec are reported while shards are still being played.
+#
+# Next to the output, a .progress sidecar records the run settings and, for
+# every shard written, its first seed and the output size after it. After an
+# interrupt, --resume truncates the output to the last recorded size (a shard
+# cut off mid-write is dropped) and plays only the missing shards.
+
+COLUMNS = ('seed', 'score', 'length', 'ticks', 'death_cause', 'board_switches')
+SHARD_SIZE = 20  # an interrupt loses at most this many games per worker
+MAX_TICKS = 100000  # games still running after this end as 'timeout'
+REPORT_INTERVAL = 1.0  # seconds between progress lines
+
+
+def random_agent(engine, seed):
+    # Random walk that avoids running straight into a wall or itself, with
+    # random board switches; seeded per game
+    rng = random.Random(seed)
+    width, height = engine.board_size
+
+    def control(engine):
+        x, y = engine.snake[0]
+        moves = [(dx, dy) for dx, dy in DIRECTIONS
+                 if 0 <= x + dx < width and 0 <= y + dy < height and (x + dx, y + dy) not in engine.occupancy]
+        if moves and (engine.direction not in moves or rng.random() < 0.2):
+            engine.queue_direction(rng.choice(moves))
+        if rng.random() < 0.05:
+            engine.switch_board(rng.choice((-1, 1)))
+
+    return control
+
+
+def autopilot_agent(engine, seed, budget=None):
+    # No planning budget by default, so results do not depend on timing
+    from snake_autopilot import Autopilot
+    return Autopilot(engine, budget)
+
+
+AGENTS = {'random': random_agent, 'autopilot': autopilot_agent}
+
+
+def play_game(seed, settings):
+    # One headless game; returns its result row
+    engine = SnakeEngine(seed, tuple(settings['board_size']), settings['board_count'])
+    control = AGENTS[settings['agent']](engine, seed)
+    ticks = simulate(engine, settings['max_ticks'], control)
+    if engine.won:
+        cause = 'won'
+    elif engine.game_over:
+        cause = engine.death_cause
+    else:
+        cause = 'timeout'
+    return (seed, engine.score, len(engine.snake), ticks, cause, engine.board_switches)
+
+
+games_done = None  # in workers: the shared count of finished games
+
+
+def start_worker(counter):
+    # Workers leave Ctrl-C to the parent, which stops the pool
+    global games_done
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    games_done = counter
+
+
+def play_shard(task):
+    # Plays seeds first_seed.. and returns (first_seed, count, gzip member)
+    first_seed, count, settings = task
+    text = io.StringIO()
+    writer = csv.writer(text, lineterminator='\n')
+    for seed in range(first_seed, first_seed + count):
+        writer.writerow(play_game(seed, settings))
+        if games_done is not None:
+            with games_done.get_lock():
+                games_done.value += 1
+    return first_seed, count, gzip.compress(text.getvalue().encode())
+
+
+def read_progress(path, settings):
+    # Returns ({first_seed of each written shard}, output size, the
+    # sidecar's complete lines), or None when there is nothing to resume
+    try:
+        with open(path) as f:
+            lines = f.read().split('\n')
+    except FileNotFoundError:
+        return None
+    if json.loads(lines[0]) != settings:
+        raise SystemExit(f'{path} was written with different settings; run without --resume')
+    done = set()
+    size = None
+    kept = lines[:1]
+    # Only lines with their newline count: the last one may have been cut
+    # off by the interrupt
+    for line in lines[1:-1]:
+        parts = line.split()
+        if len(parts) == 2:
+            done.add(int(parts[0]))
+            size = int(parts[1])
+            kept.append(line)
+    return (done, size, '\n'.join(kept) + '\n') if done else None
+
+
+def run_tournament(output, settings, workers=None, resume=False, report=None):
+    # Plays every shard not yet in `output`; report(done, total, rate) is
+    # called every REPORT_INTERVAL with the games finished so far, written
+    # or not. Returns the number of games written.
+    progress_path = output + '.progress'
+    first, games, shard_size = settings['first_seed'], settings['games'], settings['shard_size']
+    state = read_progress(progress_path, settings) if resume else None
+    if state is None:
+        done = set()
+        with open(output, 'wb') as f:
+            f.write(gzip.compress((','.join(COLUMNS) + '\n').encode()))
+        with open(progress_path, 'w') as f:
+            f.write(json.dumps(settings) + '\n')
+    else:
+        done, size, kept = state
+        with open(output, 'r+b') as f:
+            f.truncate(size)
+        # Drop a cut-off last line, or the next record would be appended to it
+        with open(progress_path, 'w') as f:
+            f.write(kept)
+    shards = [(start, min(shard_size, first + games - start))
+              for start in range(first, first + games, shard_size) if start not in done]
+    total = sum(count for _, count in shards)
+    played = 0
+    counter = multiprocessing.Value('q', 0)
+    start_time = time.perf_counter()
+    last_report = start_time
+    with open(output, 'ab') as out, open(progress_path, 'a') as progress:
+        pool = multiprocessing.Pool(workers, initializer=start_worker, initargs=(counter,))
+        try:
+            results = pool.imap_unordered(play_shard, [shard + (settings,) for shard in shards])
+            while played < total:
+                # Wake up at least once per interval to report
+                try:
+                    start, count, member = results.next(REPORT_INTERVAL)
+                except multiprocessing.TimeoutError:
+                    pass
+                else:
+                    out.write(member)
+                    out.flush()
+                    progress.write(f'{start} {out.tell()}\n')
+                    progress.flush()
+                    played += count
+                now = time.perf_counter()
+                if report is not None and (now - last_report >= REPORT_INTERVAL or played == total):
+                    done = counter.value
+                    report(done, total, done / (now - start_time))
+                    last_report = now
+        finally:
+            # On an interrupt, drop the shards in progress; --resume replays them
+            pool.terminate()
+            pool.join()
+    return played
+
+
+def read_results(path):
+    # Yields result rows as dicts from a tournament output file
+    with gzip.open(path, 'rt', newline='') as f:
+        yield from csv.DictReader(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Play seeded snake games in parallel')
+    parser.add_argument('-o', '--output', default='tournament.csv.gz', help='gzip CSV results file')
+    parser.add_argument('--games', type=int, default=10000, help='number of games (one per seed)')
+    parser.add_argument('--seed', type=int, default=0, help='first seed')
+    parser.add_argument('--agent', choices=sorted(AGENTS), default='autopilot')
+    parser.add_argument('--board-size', default='x'.join(map(str, BOARD_SIZE)), metavar='WxH')
+    parser.add_argument('--boards', type=int, default=BOARD_COUNT, help='number of boards')
+    parser.add_argument('--max-ticks', type=int, default=MAX_TICKS, help='tick limit per game')
+    parser.add_argument('--shard-size', type=int, default=SHARD_SIZE, help='games per worker task')
+    parser.add_argument('--workers', type=int, help='worker processes (default: one per CPU)')
+    parser.add_argument('--resume', action='store_true', help='continue an interrupted run')
+    args = parser.parse_args(argv)
+
+    width, _, height = args.board_size.lower().partition('x')
+    settings = {
+        'agent': args.agent,
+        'board_size': [int(width), int(height)],
+        'board_count': args.boards,
+        'max_ticks': args.max_ticks,
+        'first_seed': args.seed,
+        'games': args.games,
+        'shard_size': args.shard_size,
+    }
+
+    def report(done, total, rate):
+        print(f'\r{done}/{total} games  {rate:,.1f} games/s', end='', file=sys.stderr, flush=True)
+
+    start = time.perf_counter()
+    try:
+        played = run_tournament(args.output, settings, args.workers, args.resume, report)
+    except KeyboardInterrupt:
+        print('\ninterrupted; continue with --resume', file=sys.stderr)
+        return 130
+    elapsed = time.perf_counter() - start
+    print(f'\n{played} games in {elapsed:.1f}s, results in {args.output}', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+
+from snake_autopilot import Autopilot
+from snake_batch import ACTION_BOARD_DOWN, ACTION_BOARD_UP, ACTION_COUNT, ACTION_NONE, ACTION_RIGHT, ACTION_UP, BatchSnakeEngine
+from snake_engine import DIRECTIONS, SnakeEngine
+
+# BatchSnakeEngine must follow SnakeEngine.update() exactly. Each batch game
+# is played in lockstep with a SnakeEngine given the same actions; the two
+# only differ in their random numbers, so the engine is handed the batch's
+# apple placements.
+
+GAMES = 16
+
+
+class Keys:
+    # Autopilot target that turns its inputs into a batch action
+    def __init__(self):
+        self.action = ACTION_NONE
+
+    def queue_direction(self, direction):
+        self.action = ACTION_UP + DIRECTIONS.index(direction)
+        return True
+
+    def switch_board(self, delta):
+        return False
+
+
+def copy_apple(batch, game, engine):
+    engine.apple_board = int(batch.apple_board[game])
+    engine.apple_pos = batch.apple_pos(game)
+
+
+def apply_action(engine, action):
+    # As SnakeEnv.step() does
+    if ACTION_UP <= action <= ACTION_RIGHT:
+        engine.set_direction(DIRECTIONS[action - ACTION_UP])
+    elif action == ACTION_BOARD_UP:
+        engine.switch_board(-1)
+    elif action == ACTION_BOARD_DOWN:
+        engine.switch_board(1)
+
+
+def assert_same(batch, game, engine):
+    assert batch.snake(game) == list(engine.snake)
+    assert batch.length[game] == engine.length
+    assert batch.score[game] == engine.score
+    assert DIRECTIONS[batch.direction[game]] == engine.direction
+    assert batch.current_board[game] == engine.current_board
+    assert batch.apple_board[game] == engine.apple_board
+    assert batch.apple_pos(game) == engine.apple_pos
+    assert batch.done[game] == engine.game_over
+    assert batch.won[game] == engine.won
+
+
+def play_lockstep(board_size, board_count, ticks, policy, seed=0):
+    # Returns (games finished, games won)
+    batch = BatchSnakeEngine(GAMES, seed, board_size, board_count, auto_reset=False)
+    engines = [SnakeEngine(seed, board_size, board_count) for _ in range(GAMES)]
+    pilots = [Autopilot(engine, None) for engine in engines]
+    for game, engine in enumerate(engines):
+        copy_apple(batch, game, engine)
+    rng = np.random.default_rng(seed)
+    finished = won = 0
+    for _ in range(ticks):
+        if policy == 'random':
+            actions = rng.integers(0, ACTION_COUNT, GAMES)
+        else:
+            actions = np.full(GAMES, ACTION_NONE)
+            for game, pilot in enumerate(pilots):
+                keys = Keys()
+                pilot.step(keys)
+                actions[game] = keys.action
+        _, done = batch.step(actions)
+        for game, engine in enumerate(engines):
+            apply_action(engine, actions[game])
+            score = engine.score
+            engine.update()
+            if engine.score != score:
+                copy_apple(batch, game, engine)
+            assert_same(batch, game, engine)
+        for game in np.flatnonzero(done):
+            finished += 1
+            won += int(batch.won[game])
+            engines[game].reset()
+        batch.reset(done)
+        for game in np.flatnonzero(done):
+            pilots[game].plan.clear()
+            pilots[game].tail_route.clear()
+            copy_apple(batch, game, engines[game])
+            assert_same(batch, game, engines[game])
+    return finished, won
+
+
+@pytest.mark.parametrize('board_size, board_count', [((20, 20), 3), ((7, 5), 2), ((3, 3), 4)])
+def test_random_actions_match_engine(board_size, board_count):
+    finished, _ = play_lockstep(board_size, board_count, 2000, 'random')
+    assert finished > 0
+
+
+def test_full_board_wins_match_engine():
+    # The autopilot fills small boards, covering near-full apple sampling
+    # and the win
+    finished, won = play_lockstep((4, 4), 1, 1500, 'autopilot')
+    assert won > 0
@@ -0,0 +1,65 @@
+import numpy as np
+
+from snake_batch import ACTION_COUNT
+from snake_env import OBS_APPLE, OBS_BOARD, OBS_BODY, OBS_HEAD, OBS_ON, SnakeEnv, VecSnakeEnv
+
+# The environments patch their observations in place; after every step they
+# must equal an observation rebuilt from scratch.
+
+
+def rebuild(env, game):
+    engine = env.engine
+    obs = np.zeros(env.observation_shape, dtype=np.uint8)
+    board = engine.current_board[game]
+    obs[board, :, :, OBS_BOARD] = OBS_ON
+    snake = engine.snake(game)
+    for x, y in snake:
+        obs[board, y, x, OBS_BODY] = OBS_ON
+    x, y = snake[0]
+    obs[board, y, x, OBS_HEAD] = OBS_ON
+    apple = engine.apple_pos(game)
+    if apple is not None:
+        obs[engine.apple_board[game], apple[1], apple[0], OBS_APPLE] = OBS_ON
+    return obs
+
+
+def test_env_observation_matches_rebuild():
+    rng = np.random.default_rng(0)
+    for board_size, board_count in (((20, 20), 3), ((4, 3), 2)):
+        env = SnakeEnv(0, board_size, board_count, max_steps=500)
+        obs, _ = env.reset()
+        for _ in range(3000):
+            obs, _, terminated, truncated, _ = env.step(rng.integers(ACTION_COUNT))
+            patched = obs.copy()
+            env.write_observation()
+            assert np.array_equal(patched, env.obs)
+            if terminated or truncated:
+                obs, _ = env.reset()
+
+
+def test_vec_env_observation_matches_rebuild():
+    rng = np.random.default_rng(0)
+    for board_size, board_count in (((20, 20), 3), ((4, 3), 2)):
+        env = VecSnakeEnv(32, 0, board_size, board_count, max_steps=200)
+        restarts = 0
+        for _ in range(500):
+            obs, _, terminated, truncated, _ = env.step(rng.integers(0, ACTION_COUNT, env.num_envs))
+            restarts += int(terminated.sum() + truncated.sum())
+            for game in range(env.num_envs):
+                assert np.array_equal(obs[game], rebuild(env, game))
+        assert restarts > 0
+
+
+def test_rgb_array_envs_render_independently():
+    # Each env draws on its own surface, and closing one leaves the others
+    # working
+    a = SnakeEnv(0, render_mode='rgb_array')
+    b = SnakeEnv(1, (10, 10), render_mode='rgb_array')
+    pixels = a.render()
+    frame = pixels.copy()
+    b.render()
+    assert np.array_equal(pixels, frame)
+    del pixels
+    b.close()
+    assert np.array_equal(a.render(), frame)
+    a.close()
@@ -0,0 +1,122 @@
+import io
+import random
+
+import pytest
+
+from snake_engine import DIRECTIONS
+from snake_replay import (DELTA_ESCAPE, HEADER, ReplayError, ReplayPlayer, ReplayRecorder, check, main,
+                          read_replays)
+
+# Round trips through the binary replay format: a recorded session replayed
+# tick by tick must pass through exactly the states it was recorded in.
+
+# Idle ticks between inputs, around the one-byte limit and the varint's
+# 7-bit groups
+GAPS = (0, 1, 30, DELTA_ESCAPE, DELTA_ESCAPE + 1, DELTA_ESCAPE + 127, DELTA_ESCAPE + 128, 20000)
+
+
+def state(engine):
+    return (tuple(engine.snake), engine.score, engine.current_board, engine.apple_board, engine.apple_pos,
+            engine.game_over)
+
+
+def record_session(path, seed, inputs=120):
+    # Records random turns, board switches and restarts separated by GAPS;
+    # returns the engine state after every tick
+    rng = random.Random(seed)
+    recorder = ReplayRecorder.open(path, seed, (12, 10), 3)
+    engine = recorder.engine
+    states = [state(engine)]
+    for _ in range(inputs):
+        roll = rng.random()
+        if engine.game_over and roll < 0.5:
+            recorder.reset()
+        elif roll < 0.7:
+            recorder.queue_direction(rng.choice(DIRECTIONS))
+        else:
+            recorder.switch_board(rng.choice((-1, 1)))
+        for _ in range(rng.choice(GAPS)):
+            recorder.update()
+            states.append(state(engine))
+    recorder.close()
+    return states
+
+
+def replay_states(replay):
+    player = ReplayPlayer(replay)
+    states = [state(player.engine)]
+    while player.advance():
+        states.append(state(player.engine))
+    return states
+
+
+def test_round_trip(tmp_path):
+    path = tmp_path / 'session.rpl'
+    states = record_session(path, 1)
+    replay = next(read_replays(str(path)))
+    assert replay.seed == 1 and replay.board_size == (12, 10) and replay.board_count == 3
+    assert replay_states(replay) == states
+
+
+def test_concatenated_archive(tmp_path):
+    sessions = []
+    parts = []
+    for seed in (2, 3, 4):
+        path = tmp_path / f'{seed}.rpl'
+        sessions.append(record_session(path, seed))
+        parts.append(path.read_bytes())
+    archive = tmp_path / 'archive.rpl'
+    archive.write_bytes(b''.join(parts))
+    # Memory-mapped from a path and streamed from a file object
+    for source in (str(archive), io.BytesIO(archive.read_bytes())):
+        replays = read_replays(source)
+        for states in sessions:
+            assert replay_states(next(replays)) == states
+        assert next(replays, None) is None
+    # check() also works through every recording, skipping unread events
+    results = list(check(str(archive)))
+    assert {index for index, _ in results} == {0, 1, 2}
+    assert not any(result.truncated for _, result in results)
+
+
+def test_recording_without_end_is_truncated(tmp_path):
+    path = tmp_path / 'killed.rpl'
+    states = record_session(path, 5)
+    data = path.read_bytes()
+    complete = list(check(str(path)))
+    path.write_bytes(data[:-1])  # the END byte, as if the recorder was killed
+    results = list(check(str(path)))
+    assert [r.truncated for _, r in results] == [False] * (len(results) - 1) + [True]
+    assert [r[:4] for _, r in results[:-1]] == [r[:4] for _, r in complete[:-1]]
+    # Replaying stops at the last input; everything up to it is intact
+    replay = next(read_replays(str(path)))
+    replayed = replay_states(replay)
+    assert replayed == states[:len(replayed)]
+
+
+def test_cut_inside_an_event(tmp_path):
+    # A long gap's varint cut off after its first byte
+    path = tmp_path / 'cut.rpl'
+    recorder = ReplayRecorder.open(path, 6)
+    recorder.queue_direction(DIRECTIONS[2])
+    for _ in range(5000):
+        recorder.update()
+    recorder.queue_direction(DIRECTIONS[0])
+    recorder.close()
+    data = path.read_bytes()
+    path.write_bytes(data[:HEADER.size + 2])
+    (_, result), = check(str(path))
+    assert result.truncated and result.ticks == 0
+
+
+def test_damaged_files(tmp_path, capsys):
+    path = tmp_path / 'bad.rpl'
+    path.write_bytes(b'SNKR\x01\x00')
+    with pytest.raises(ReplayError):
+        list(check(str(path)))
+    path.write_bytes(b'NOPE' + bytes(HEADER.size - 4))
+    with pytest.raises(ReplayError):
+        list(check(str(path)))
+    # The command line reports it instead of a traceback
+    assert main(['check', str(path)]) == 1
+    assert 'not a snake replay' in capsys.readouterr().err
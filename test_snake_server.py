@@ -0,0 +1,188 @@
+import asyncio
+import random
+from collections import deque
+
+import snake_server
+from snake_engine import DOWN, LEFT, RIGHT
+from snake_replay import EV_RESTART
+from snake_server import D_DIE, DEATH_CAUSES, MSG_JOIN, NO_CELL, FakeClient, Room, SnakeServer, frame
+
+# Rooms driven by in-memory fake clients. Every client's ClientState is
+# rebuilt only from the frames it received, so matching the room after each
+# tick checks the deltas as well as the rules.
+
+
+def assert_in_sync(room, clients):
+    for client in clients:
+        assert client.state.matches(room)
+
+
+def place(room, clients, layout):
+    # Moves snakes to fixed cells: layout maps client -> (cells, direction).
+    # Clients are resynchronised with a fresh snapshot, as a joining player
+    # would get.
+    for client, (cells, direction) in layout.items():
+        player = client.player
+        for cell in player.snake:
+            room.grid.remove(cell)
+        player.snake = deque(cells)
+        for cell in cells:
+            room.grid.add(cell, player.id)
+        player.length = len(cells)
+        player.direction = direction
+    for client in clients:
+        client.receive(room.welcome(client.player))
+
+
+def deaths(deltas):
+    return {delta[1]: DEATH_CAUSES[delta[2]] for delta in deltas if delta[0] == D_DIE}
+
+
+def start_room(players, board_size=(20, 20)):
+    room = Room('test', seed=0, board_size=board_size)
+    clients = [FakeClient(room) for _ in range(players)]
+    room.step()
+    return room, clients
+
+
+def test_join_leave_churn_stays_in_sync():
+    rng = random.Random(0)
+    room = Room('churn', seed=0, board_size=(16, 16))
+    clients = []
+    joins = leaves = 0
+    for _ in range(1000):
+        if not clients or rng.random() < 0.2:
+            clients.append(FakeClient(room))
+            joins += 1
+        if clients and rng.random() < 0.15:
+            room.leave(clients.pop(rng.randrange(len(clients))).player)
+            leaves += 1
+        for client in clients:
+            client.play()
+        room.step()
+        assert_in_sync(room, clients)
+    assert joins > 100 and leaves > 100
+
+
+def test_head_on_collision_kills_both():
+    room, clients = start_room(2)
+    a, b = clients
+    # Heads one cell apart, moving into the same cell
+    place(room, clients, {a: ([(5, 5), (4, 5)], RIGHT), b: ([(7, 5), (8, 5)], LEFT)})
+    died = deaths(room.step())
+    assert died == {a.player.id: 'head', b.player.id: 'head'}
+    assert not a.player.alive and not b.player.alive
+    assert_in_sync(room, clients)
+
+
+def test_heads_swapping_cells_kills_both():
+    room, clients = start_room(2)
+    a, b = clients
+    place(room, clients, {a: ([(5, 5), (4, 5)], RIGHT), b: ([(6, 5), (7, 5)], LEFT)})
+    died = deaths(room.step())
+    assert died == {a.player.id: 'snake', b.player.id: 'snake'}
+    assert_in_sync(room, clients)
+
+
+def test_running_into_another_body():
+    room, clients = start_room(2)
+    a, b = clients
+    # a moves down into the middle of b's body; b moves on unharmed, on
+    # whichever board it is
+    b.player.board = 0
+    place(room, clients, {a: ([(6, 4), (6, 3)], DOWN), b: ([(5, 5), (6, 5), (7, 5)], LEFT)})
+    died = deaths(room.step())
+    assert died == {a.player.id: 'snake'}
+    assert b.player.alive and b.player.snake[0] == (4, 5)
+    assert not any(room.grid.get(cell) == a.player.id for cell in [(6, 4), (6, 3)])
+    assert_in_sync(room, clients)
+
+
+def test_dead_player_respawns_on_restart():
+    room, clients = start_room(2)
+    a, _ = clients
+    place(room, clients, {a: ([(0, 0), (1, 0)], LEFT)})
+    assert deaths(room.step()) == {a.player.id: 'wall'}
+    room.step()
+    assert not a.player.alive
+    a.press(EV_RESTART)
+    room.step()
+    # Spawned at the start of the tick, then moved like everyone else
+    assert a.player.alive and len(a.player.snake) == 2
+    assert all(room.grid.get(cell) == a.player.id for cell in a.player.snake)
+    assert_in_sync(room, clients)
+    for _ in range(5):
+        room.step()
+    assert a.player.alive
+    assert_in_sync(room, clients)
+
+
+def test_ids_still_in_use_are_skipped():
+    room, clients = start_room(2)
+    room.next_id = clients[1].player.id
+    late = FakeClient(room)
+    room.next_id = NO_CELL - 1
+    later = FakeClient(room)
+    wrapped = FakeClient(room)
+    ids = [client.player.id for client in clients + [late, later, wrapped]]
+    assert len(set(ids)) == len(ids) and max(ids) < NO_CELL
+    room.step()
+    assert_in_sync(room, clients + [late, later, wrapped])
+
+
+class StalledTransport:
+    # A connection whose peer never reads: everything written stays queued
+    def __init__(self, reader):
+        self.reader = reader
+        self.buffered = 0
+        self.aborted = False
+
+    def is_closing(self):
+        return self.aborted
+
+    def get_write_buffer_size(self):
+        return self.buffered
+
+    def abort(self):
+        # The server's read loop then sees the connection end
+        self.aborted = True
+        self.reader.feed_eof()
+
+
+class StalledWriter:
+    def __init__(self, reader):
+        self.transport = StalledTransport(reader)
+        self.closed = False
+
+    def write(self, data):
+        self.transport.buffered += len(data)
+
+    def close(self):
+        self.closed = True
+
+
+def test_slow_client_is_dropped(monkeypatch):
+    monkeypatch.setattr(snake_server, 'MAX_SEND_BUFFER', 4096)
+
+    async def scenario():
+        server = SnakeServer(seed=0)
+        reader = asyncio.StreamReader()
+        writer = StalledWriter(reader)
+        reader.feed_data(frame(bytes([MSG_JOIN]) + b'lobby'))
+        handler = asyncio.create_task(server.handle_client(reader, writer))
+        await asyncio.sleep(0)
+        room = server.rooms['lobby']
+        other = FakeClient(room)
+        for _ in range(2000):
+            other.play()
+            server.step()
+            await asyncio.sleep(0)
+            if handler.done():
+                break
+        assert writer.transport.aborted and writer.closed
+        await handler
+        server.step()
+        assert list(room.players) == [other.player.id]
+        assert other.state.matches(room)
+
+    asyncio.run(scenario())